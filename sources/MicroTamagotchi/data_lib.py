@@ -8,6 +8,202 @@
 
 #NOTE: this lib exists because micropython on microbit don't have 'json' module ...
 FILE_EXT = ".mtd" # Micro Tamagochi Data
+CHARACTER_PREFIX = "ch_" # a file by character : ch_[name].mtd
+JOURNAL_FILE = "journal.mtd" # files to write (or remove) of a transaction
+STAGED_PREFIX = "tmp_" # files uploaded before a transaction, moved by the journal
+
+def character_file(name:str):
+    """Get the .mtd file of a character."""
+    return CHARACTER_PREFIX + name + FILE_EXT
+
+class Parser:
+    """
+    Parser of .mtd data (dict, list, tuple, str, int, float, True, False, None)
+    streamed from a file read by blocks (or from a text), without eval.
+    """
+
+    escapes = {"n": "\n", "r": "\r", "t": "\t", "0": "\0", "\\": "\\", "'": "'", '"': '"'}
+
+    def __init__(self, f_read=None, text="", block_size=64):
+        self.f_read = f_read
+        self.block_size = block_size
+        self.buf = text
+        self.i = 0
+
+    def peek(self):
+        """Get the actual char ('' at the end)."""
+        if self.i >= len(self.buf):
+            if self.f_read is None:
+                return ""
+            self.buf = self.f_read.read(self.block_size)
+            self.i = 0
+            if not self.buf:
+                return ""
+        return self.buf[self.i]
+
+    def next(self):
+        """Get the actual char and go to the next."""
+        char = self.peek()
+        self.i += 1
+        return char
+
+    def skip(self):
+        """Skip spaces and comments."""
+        while True:
+            char = self.peek()
+            if char == "#":
+                while self.peek() not in ("\n", ""):
+                    self.i += 1
+            elif char and char in " \t\r\n":
+                self.i += 1
+            else:
+                return char
+
+    def expect(self, chars):
+        """Get the next char (after spaces) if in chars, else raise ValueError."""
+        char = self.skip()
+        if not char or char not in chars:
+            raise ValueError("'%s' expected, got '%s'" % (chars, char))
+        self.i += 1
+        return char
+
+    def parse(self):
+        """Parse all the data (only one value)."""
+        value = self.parse_value()
+        if self.skip():
+            raise ValueError("unexpected data after the value")
+        return value
+
+    def parse_value(self):
+        """Parse a value."""
+        char = self.skip()
+        if char == "{":
+            return self.parse_dict()
+        if char in ("[", "("):
+            return self.parse_sequence()
+        if char and char in "'\"":
+            return self.parse_string()
+        if char and char in "+-.0123456789":
+            return self.parse_number()
+        if char.isalpha():
+            word = []
+            while self.peek().isalpha():
+                word.append(self.next())
+            word = "".join(word)
+            if word == "True": return True
+            if word == "False": return False
+            if word == "None": return None
+            raise ValueError("unknown name '%s'" % word)
+        raise ValueError("unexpected '%s'" % char)
+
+    def parse_dict(self):
+        """Parse a dict."""
+        self.expect("{")
+        data = {}
+        while self.skip() != "}":
+            key = self.parse_value()
+            self.expect(":")
+            data[key] = self.parse_value()
+            if self.expect(",}") == "}":
+                return data
+        self.i += 1
+        return data
+
+    def parse_sequence(self):
+        """Parse a list or a tuple."""
+        end = "]" if self.expect("[(") == "[" else ")"
+        data = []
+        while self.skip() != end:
+            data.append(self.parse_value())
+            if self.expect("," + end) == end:
+                break
+        else:
+            self.i += 1
+        return data if end == "]" else tuple(data)
+
+    def parse_string(self):
+        """Parse a string (with escapes)."""
+        quote = self.next()
+        chars = []
+        while True:
+            char = self.next()
+            if char == quote:
+                return "".join(chars)
+            if char == "\\":
+                char = self.next()
+                if char in ("x", "u"):
+                    char = chr(int(self.next() + self.next() + (self.next() + self.next() if char == "u" else ""), 16))
+                elif char == "\n":
+                    continue # line continuation
+                elif char in self.escapes:
+                    char = self.escapes[char]
+                else:
+                    raise ValueError("unknown escape '\\%s'" % char)
+            elif not char or char == "\n":
+                raise ValueError("unterminated string")
+            chars.append(char)
+
+    def parse_number(self):
+        """Parse an int or a float."""
+        chars = []
+        while self.peek() and self.peek() in "+-.0123456789eE":
+            chars.append(self.next())
+        number = "".join(chars)
+        if "." in number or "e" in number or "E" in number:
+            return float(number)
+        return int(number)
+
+def decode_pixels(code:str, prev=None):
+    """Decode the pixels of a compact frame: a char by pixel (chr(48 + pixel)), run-length ("r" + count letter, pixel) or changes of prev ("d" + index letter, pixel)."""
+    if code[0] == "r":
+        pixels = []
+        for i in range(1, len(code), 2):
+            pixels.extend([ord(code[i + 1]) - 48] * (ord(code[i]) - 96))
+        return pixels
+    if code[0] == "d":
+        pixels = list(prev)
+        for i in range(1, len(code), 2):
+            pixels[ord(code[i]) - 97] = ord(code[i + 1]) - 48
+        return pixels
+    return [ord(pix) - 48 for pix in code]
+
+class Frames:
+    """
+    Frames of a character (like a list of [pixels, size]). The compact
+    characters ({"delay", "seq": indexes, "frames": [width, height, code]})
+    keep their frames encoded, a frame is decoded when it's got (only the
+    last one is kept).
+    """
+
+    def __init__(self, character:dict):
+        self.seq = character.get("seq")
+        self.frames = character["frames"] if self.seq is not None else character["data"]
+        self._indx = None # last decoded frame
+        self._pixels = None
+
+    def __len__(self):
+        return len(self.seq if self.seq is not None else self.frames)
+
+    def __getitem__(self, indx):
+        if self.seq is None:
+            return self.frames[indx]
+        indx = self.seq[indx]
+        width, height, code = self.frames[indx]
+        if indx != self._indx:
+            if code[0] == "d" and self._indx != indx - 1:
+                # decode from the last frame who is not a delta
+                start = indx - 1
+                while self.frames[start][2][0] == "d":
+                    start -= 1
+                for i in range(start, indx):
+                    self._pixels = decode_pixels(self.frames[i][2], self._pixels)
+            self._pixels = decode_pixels(code, self._pixels)
+            self._indx = indx
+        return self._pixels, [width, height]
+
+def loads(text:str):
+    """Load data of a .mtd text."""
+    return Parser(text=text).parse()
 
 def dump(data:dict, filename:str):
     """Dump dict in a .mtd file."""
@@ -23,4 +219,43 @@ def load(filename:str):
     assert filename.endswith(FILE_EXT), "file ext must be %s"%FILE_EXT
     # load data
     with open(filename, 'r') as f_read:
-        return eval(f_read.read()) # extract data from str
+        return Parser(f_read).parse() # extract data streamed from the file
+
+def commit(journal_file:str=JOURNAL_FILE) -> bool:
+    """
+    Apply a transaction (interrupted if the journal is found at the boot),
+    return False if there is no transaction or if it is discarded.
+    """
+    import os
+    try:
+        journal = load(journal_file) # filename: content (None for remove, (staged file,) for move)
+    except OSError:
+        return False # no transaction
+    except Exception:
+        journal = None # incomplete journal, the transaction is discarded
+    if not isinstance(journal, dict):
+        os.remove(journal_file)
+        return False
+    for filename in journal:
+        if journal[filename] is None:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        elif isinstance(journal[filename], tuple):
+            try:
+                f_read = open(journal[filename][0], 'r')
+            except OSError:
+                continue # already moved (transaction interrupted)
+            with f_read, open(filename, 'w') as f_write:
+                while True:
+                    block = f_read.read(256)
+                    if not block:
+                        break
+                    f_write.write(block)
+            os.remove(journal[filename][0])
+        else:
+            with open(filename, 'w') as f_write:
+                f_write.write(journal[filename])
+    os.remove(journal_file)
+    return True
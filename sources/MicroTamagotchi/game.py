@@ -11,7 +11,7 @@ import gc
 
 
 # server program (with neopix)
-def server(radio, set_np, actualize_np, off_np):
+def server(radio, set_np, actualize_np, off_np, add_np=None):
     """MicroTamagotchi Game - Server Program"""
     # imports
     from microbit import display, Image, sleep, pin_logo
@@ -26,6 +26,7 @@ def server(radio, set_np, actualize_np, off_np):
     blue = (0,0,255)
     player1_started = False
     player2_started = False
+    loop_ms = 20 # max sleep of the loops (the radio keep the messages received)
 
     # functions
     def actualize_count(new_count):
@@ -47,9 +48,12 @@ def server(radio, set_np, actualize_np, off_np):
                 player1_started = True
             elif message == "player2_started":
                 player2_started = True
-        
-        actualize_np()
+            continue
+
+        # animation (sleep until his next change)
+        wait = actualize_np()
         gc.collect()
+        sleep(loop_ms if wait is None else min(wait, loop_ms))
 
     # send start
     radio.send("starting")
@@ -80,12 +84,20 @@ def server(radio, set_np, actualize_np, off_np):
             actualize_np((count, blue,green))
             if count == 30:
                 count_locked = True
-                display.scroll("player 1 win")
+                if add_np is not None:
+                    add_np("flash", (green, 400))
+                display.scroll("player 1 win", wait=False)
             elif count == 0:
                 count_locked = True
-                display.scroll("player 2 win")
+                if add_np is not None:
+                    add_np("flash", (blue, 400))
+                display.scroll("player 2 win", wait=False)
+            continue
 
+        # animation and frame delayed by the fps limit (sleep until his next change)
+        wait = actualize_np()
         gc.collect()
+        sleep(loop_ms if wait is None else min(wait, loop_ms))
 
 
 # player program
@@ -1,98 +1,270 @@
 #Projet: MicroTamagotchi
 #Auteurs: Killian Nallet, Mattéo Martin-Boileux
-#Python: Micropython v1.13 (on microbit v2)
+#Python: Micropython v1.13 (on microbit v2) / Python >= 3.9
 #Coding: utf-8
 
 
 #--- MICROTAMAGOTCHI - LIB_NEOPIX MICROBIT ---
 
 # imports
-from microbit import *
-from neopixel import NeoPixel
+import sys
+if sys.platform == "microbit":
+    from neopixel import NeoPixel
+    from time import ticks_ms, ticks_us, ticks_add, ticks_diff
+else:
+    # simulated strip (for develop and benchmark the modes)
+    from lib_simulator.microTk.neopixel import NeoPixel
+    from lib_simulator.microTk._timebase import ticks_ms, ticks_us, ticks_add, ticks_diff
 
 
+# constants
+FPS_MAX = 30 # max refreshes of the strip by second
+DEBUG_STATS = False # print the debug counters each second
+PULSE_STEP_MS = 10 # duration of a step of the pulse (the speed is the step of the value)
+MODES = ["pulse", "all", "count", "flash"]
+
 # variables for neopixel band
-actual_mode = None
-actual_data = None
 np = None
 nb_leds = None
-redefine_list_pulse = True
-lsts_values_pulse = [[i for i in range(0, 256, 1)], [i for i in range(255, -1, -1)]]
-indx_lst_pulse = 0
-lst_values_pulse = None
-indx_value_pulse = None
+np_buf = None # buffer of the strip for bulk writes (None if the driver don't have it)
+np_order = (1, 0, 2) # position of the r, g, b bytes of a pixel in the buffer (grb)
+layers = [] # effects drawn from bottom to top: [mode, data, pixels table, start ms, end ms or None]
+next_update = None # ticks_ms of the next change of the effects (None: nothing planned)
+dirty = False # the effects changed since the last frame
+shadow = None # frame to show on the strip (3 bytes of each led)
+written = None # frame written in the strip (the driver buffer if available)
+pending = False # the shadow is not shown yet
+last_show = 0
+
+# debug counters
+nb_shows = 0
+nb_skipped = 0 # frames without changes
+nb_limited = 0 # frames delayed by the fps limit
+show_us = 0 # time spent in np.show()
+stats_start = 0
 
 def init_neopix(nb, pin):
     """ Function for init neopix"""
     global nb_leds
     global np
+    global np_buf
+    global np_order
+    global shadow
+    global written
+    global pending
     nb_leds = nb
     np = NeoPixel(pin, nb_leds)
+    np_order = tuple(getattr(np, "ORDER", np_order)[:3])
+    np_buf = getattr(np, "buf", None)
+    if not isinstance(np_buf, bytearray) or len(np_buf) != nb_leds * 3:
+        np_buf = None
+    shadow = bytearray(nb_leds * 3)
+    written = np_buf if np_buf is not None else bytearray(nb_leds * 3)
+    pending = True # the strip state is unknown
+    neopix_stats()
 
 
-def actualize_neopix(new_data=None):
-    """Function for actualize neopix with mode set"""
-    global actual_data
-    if new_data != None:
-        actual_data = new_data
-    # all
-    if actual_mode == "all":
+def _pixel(color) -> bytes:
+    """Function for convert a (r, g, b) color to the 3 bytes of a pixel in the buffer"""
+    pixel = bytearray(3)
+    for i in range(3):
+        pixel[np_order[i]] = color[i]
+    return bytes(pixel)
+
+
+def _color(pixels, indx):
+    """Function for get the (r, g, b) color of the pixel indx in pixels"""
+    indx *= 3
+    return (pixels[indx + np_order[0]], pixels[indx + np_order[1]], pixels[indx + np_order[2]])
+
+
+def _write_frame(pixels, force=False):
+    """Function for set the frame to show (3 bytes of each led), shown if changed and the fps limit allow it"""
+    global pending
+    global nb_skipped
+    global nb_limited
+    if pixels != shadow:
+        shadow[:] = pixels
+        pending = True
+    elif not pending:
+        nb_skipped += 1
+        return
+    if not force and ticks_diff(ticks_ms(), last_show) < 1000 // FPS_MAX:
+        nb_limited += 1
+        return
+    _show()
+
+
+def _show():
+    """Function for write the changed pixels of the shadow to the strip and show it"""
+    global pending
+    global last_show
+    global nb_shows
+    global show_us
+    if np_buf is not None:
+        np_buf[:] = shadow
+    else:
         for i in range(nb_leds):
-            np[i] = actual_data
-        np.show()
-
-    # pulse (to test)
-    elif actual_mode == "pulse":
-        global redefine_list_pulse
-        global indx_lst_pulse
-        global lst_values_pulse
-        global indx_value_pulse
-
-        color_led, vit = actual_data
-        if redefine_list_pulse:
-            if indx_lst_pulse == 1:
-                indx_lst_pulse = 0
-            else:
-                indx_lst_pulse = 1
-            lst_values_pulse = lsts_values_pulse[indx_lst_pulse]
-            indx_value_pulse = 0
-            redefine_list_pulse = False
-
-        value = lst_values_pulse[indx_value_pulse]
+            indx = i * 3
+            if shadow[indx:indx + 3] != written[indx:indx + 3]:
+                written[indx:indx + 3] = shadow[indx:indx + 3]
+                np[i] = _color(shadow, i)
+    start = ticks_us()
+    np.show()
+    show_us += ticks_diff(ticks_us(), start)
+    nb_shows += 1
+    last_show = ticks_ms()
+    pending = False
+    if DEBUG_STATS and ticks_diff(last_show, stats_start) >= 1000:
+        print("neopix:", neopix_stats())
+
+
+def neopix_stats(reset=True) -> dict:
+    """Function for get the debug counters of the strip (updates by second, ms in show by second)"""
+    global nb_shows
+    global nb_skipped
+    global nb_limited
+    global show_us
+    global stats_start
+    duration = max(ticks_diff(ticks_ms(), stats_start), 1)
+    stats = {
+        "updates_s": nb_shows * 1000 // duration,
+        "show_ms_s": show_us // duration,
+        "skipped": nb_skipped,
+        "limited": nb_limited,
+    }
+    if reset:
+        nb_shows, nb_skipped, nb_limited, show_us = 0, 0, 0, 0
+        stats_start = ticks_ms()
+    return stats
+
+
+def _compile(mode, data) -> bytes:
+    """Function for precompute the pixels (3 bytes in buffer order) of the frames of an effect"""
+    # all: 1 frame
+    if mode == "all":
+        return _pixel(data)
+    # pulse: 1 frame by value of the channel at 255 (down and up)
+    if mode == "pulse":
+        color_led, vit = data
         color_led = list(color_led)
-        color_led[color_led.index(255)] = value
-        color_led = tuple(color_led)
-        for i in range(nb_leds):
-            np[i] = color_led
-        np.show()
-        indx_value_pulse += vit
+        channel = color_led.index(255)
+        pixels_table = bytearray()
+        for value in list(range(255, 0, -vit)) + list(range(0, 255, vit)):
+            color_led[channel] = value
+            pixels_table.extend(_pixel(color_led))
+        return bytes(pixels_table)
+    # count: pixels of the 2 colors
+    if mode == "count":
+        return _pixel(data[1]) + _pixel(data[2])
+    # flash: pixel of the color
+    return _pixel(data[0])
 
-        if indx_value_pulse >= 255:
-            redefine_list_pulse = True
 
-    # count
-    elif actual_mode == "count":
-        count, color_led1, color_led2 = actual_data
-        for i in range(nb_leds):
-            if i+1 > count:
-                np[i] = color_led1
-            else:
-                np[i] = color_led2
-        np.show()
+def _render(layer, now):
+    """Function for get the frame of an effect (None if transparent) and the ms before his next change (None if never)"""
+    mode, data, pixels_table, start, _ = layer
+    # all: the same pixel on all leds
+    if mode == "all":
+        return pixels_table * nb_leds, None
+    # count: the leds before count in color 2, others in color 1
+    if mode == "count":
+        count = min(max(int(data[0]), 0), nb_leds)
+        return pixels_table[3:] * count + pixels_table[:3] * (nb_leds - count), None
+    elapsed = ticks_diff(now, start)
+    # pulse: the frame of the actual step
+    if mode == "pulse":
+        indx = elapsed // PULSE_STEP_MS % (len(pixels_table) // 3) * 3
+        return pixels_table[indx:indx + 3] * nb_leds, PULSE_STEP_MS - elapsed % PULSE_STEP_MS
+    # flash: on the first half of the period, transparent the other half
+    half_period = max(data[1] // 2, 1)
+    wait = half_period - elapsed % half_period
+    if elapsed // half_period % 2 == 0:
+        return pixels_table * nb_leds, wait
+    return None, wait
+
+
+def _update(now):
+    """Function for draw the effects on the strip and plan the next update"""
+    global next_update
+    global dirty
+    # remove the ended effects
+    layers[:] = [layer for layer in layers if layer[4] is None or ticks_diff(layer[4], now) > 0]
+    next_ms = None
+    for layer in layers:
+        if layer[4] is not None:
+            next_ms = ticks_diff(layer[4], now) if next_ms is None else min(next_ms, ticks_diff(layer[4], now))
+    # the top effect not transparent hide the others
+    frame = None
+    for layer in reversed(layers):
+        frame, wait = _render(layer, now)
+        if wait is not None:
+            next_ms = wait if next_ms is None else min(next_ms, wait)
+        if frame is not None:
+            break
+    _write_frame(frame if frame is not None else bytes(nb_leds * 3))
+    next_update = ticks_add(now, next_ms) if next_ms is not None else None
+    dirty = False
+
+
+def actualize_neopix(new_data=None):
+    """Function for actualize neopix (never block), return the ms before the next change (None if nothing planned)"""
+    global dirty
+    now = ticks_ms()
+    if new_data != None and layers:
+        # new data of the main effect (only the count changed: the pixels are kept)
+        layer = layers[0]
+        if not (layer[0] == "count" and new_data[1:] == layer[1][1:]):
+            layer[2] = _compile(layer[0], new_data)
+        layer[1] = new_data
+        dirty = True
+
+    if dirty or (next_update is not None and ticks_diff(now, next_update) >= 0):
+        _update(now)
+    elif pending:
+        # frame delayed by the fps limit
+        _write_frame(shadow)
+
+    # time before the next update or the next frame allowed by the fps limit
+    waits = []
+    if next_update is not None:
+        waits.append(ticks_diff(next_update, now))
+    if pending:
+        waits.append(ticks_diff(ticks_add(last_show, 1000 // FPS_MAX), now))
+    return max(min(waits), 0) if waits else None
 
 
 def set_neopix(mode:str, data, act=False):
-    """Function for set the mode to use neopix"""
-    global actual_mode
-    global actual_data
-    assert mode in ["pulse", "all", "count"]
-    actual_mode, actual_data = mode, data
+    """Function for set the main effect of neopix (remove the others)"""
+    global dirty
+    assert mode in MODES
+    layers[:] = [[mode, data, _compile(mode, data), ticks_ms(), None]]
+    dirty = True
     if act:
-        neopix_actualize()
+        actualize_neopix()
+
+
+def add_neopix(mode:str, data, duration_ms=None):
+    """Function for add an effect over the others (replace the effect of the same mode), removed after duration_ms"""
+    global dirty
+    assert mode in MODES
+    now = ticks_ms()
+    remove_neopix(mode)
+    end = ticks_add(now, duration_ms) if duration_ms is not None else None
+    layers.append([mode, data, _compile(mode, data), now, end])
+    dirty = True
+
+
+def remove_neopix(mode:str):
+    """Function for remove the added effects of a mode"""
+    global dirty
+    layers[1:] = [layer for layer in layers[1:] if layer[0] != mode]
+    dirty = True
 
 
 def off_neopix():
-    """Function for off neopix leds"""
-    for i in range(nb_leds):
-        np[i] = (0,0,0)
-    np.show()
+    """Function for off neopix leds (remove all effects)"""
+    global next_update
+    layers[:] = []
+    next_update = None
+    _write_frame(bytes(nb_leds * 3), True)
@@ -14,6 +14,7 @@ Containment:
 -- microbit.accelerometer
 -- microbit.compass
 -- microbit.music
+-- neopixel (import lib_simulator.microTk.neopixel)
 - object
 -- microbit.button_a
 -- microbit.button_b
@@ -34,15 +35,7 @@ from . import music
 from .music import Sound
 from .radio import radio
 
-# neopix
-def init_neopix(*args):
-    pass
-def set_neopix(*args):
-    pass
-def neopix_actualize(*args):
-    pass
-def off_neopix(*args):
-    pass
+# connection
 def check_connect(*args):
     pass
 
@@ -51,6 +44,5 @@ __all__ = [
     'pin0', 'pin1', 'pin2', 'pin3', 'pin4', 'pin5', 'pin6', 'pin7', 'pin8',
     'pin9', 'pin10', 'pin11', 'pin12', 'pin13', 'pin14', 'pin15', 'pin16',
     'pin19', 'pin20', 'temperature', 'time', 'music', 'sleep', 'radio', 'Sound',
-    'pin_logo', 'init_neopix', 'set_neopix', 'neopix_actualize', 'off_neopix',
-    'check_connect'
+    'pin_logo', 'check_connect'
 ]
@@ -1,6 +1,8 @@
 __doc__ = '''Tkinter layout module
 Initialize window with tkinter and a virtual LED class
 also export mouse actions to buttons and temperature
+no window if the environment variable MICROTK_HEADLESS is set to 1
+(neopixel strips are only logged)
 
 Containment:
 - class:
@@ -10,10 +12,15 @@ Containment:
 from tkinter import *
 from threading import Thread
 import random
-from os import _exit
+from os import _exit, environ
 from time import perf_counter, sleep
 from ._hardware import button_a, button_b, pin_logo, temperature, _pin
 from ._sub_window import *
+from .neopixel import NeoPixel
+
+
+# run without window
+HEADLESS = environ.get('MICROTK_HEADLESS') == '1'
 
 
 # simulated LED class
@@ -391,6 +398,11 @@ def run_screen(width=500, height=400, version=2.0, random_color=False):
                     if p:
                         p._update_color(cv)
 
+            if 'update neopixel strips':
+                for strip in NeoPixel.strips:
+                    if not strip._uptodate:
+                        strip.update_canvas(tk)
+
             if 'update information bar':
                 # left shows LED lightness
                 left_text = ''
@@ -422,8 +434,11 @@ for x in range(5):
         LED.pool[x][y] = LED()
 
 # run screen
-_screen_thread = Thread(target=run_screen)
-_screen_thread.start()
+if HEADLESS:
+    NeoPixel.render = 'log'
+else:
+    _screen_thread = Thread(target=run_screen)
+    _screen_thread.start()
 
 
 # ============ beeper thread ============
@@ -453,6 +468,6 @@ def run_beeper():
             beep(tone[1], dur)
 
 
-# run beeper
-_beeper_thread = Thread(target=run_beeper)
+# run beeper (stopped with the program if no window)
+_beeper_thread = Thread(target=run_beeper, daemon=HEADLESS)
 _beeper_thread.start()
@@ -5,8 +5,13 @@ Extension of microbit:
 - method
 -- microbit.running_time
 -- microbit.sleep
+- time module
+-- time.ticks_ms
+-- time.ticks_us
+-- time.ticks_add
+-- time.ticks_diff
 '''
-__all__ = ['sleep', 'sleep_ms', 'ticks_ms']
+__all__ = ['sleep', 'sleep_ms', 'ticks_ms', 'ticks_us', 'ticks_add', 'ticks_diff']
 
 from time import sleep as _sleep, perf_counter as _time
 
@@ -25,4 +30,20 @@ _init_time = _time()
 def ticks_ms():
     '''Return the number of milliseconds since the board was switched on or
     restarted.'''
-    return (_time() - _init_time) * 1000
+    return int((_time() - _init_time) * 1000)
+
+
+def ticks_us():
+    '''Return the number of microseconds since the board was switched on or
+    restarted.'''
+    return int((_time() - _init_time) * 1000000)
+
+
+def ticks_add(ticks, delta):
+    '''Offset a ticks value by a number (positive or negative).'''
+    return ticks + delta
+
+
+def ticks_diff(ticks1, ticks2):
+    '''Return the signed difference between two ticks values.'''
+    return ticks1 - ticks2
@@ -0,0 +1,108 @@
+__doc__ = '''micro:bit neopixel module
+pixels stored in a buffer (like the micropython driver), shown in a window
+of the screen thread or logged (headless), with the write time of a real strip
+
+Containment:
+- class:
+-- neopixel.NeoPixel
+'''
+__all__ = ['NeoPixel']
+
+from tkinter import Toplevel, Canvas
+from collections import deque
+from ._timebase import ticks_ms, _time
+
+
+class NeoPixel:
+    ORDER = (1, 0, 2, 3)  # grb strip
+    strips = []  # strips drawn by the screen thread
+
+    # simulation options
+    render = 'tk'  # 'tk': window of the screen thread, 'log': frames_log only, None
+    timing = True  # show() takes the time of a real strip
+    bit_us = 1.25  # ws2812: 800 kHz
+    latch_us = 50  # reset time after the data
+    log_max = 10000  # max frames kept in frames_log
+
+    def __init__(self, pin, n, bpp=3):
+        assert bpp in (3, 4)
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self.buf = bytearray(n * bpp)
+        self.frames_log = deque(maxlen=NeoPixel.log_max)  # (ticks_ms, bytes of buf)
+        self.show_count = 0
+        self.show_time = 0  # seconds spent in show()
+
+        # canvas of the screen thread
+        self._uptodate = True
+        self._shown = bytes(n * bpp)
+        self._window = None
+        NeoPixel.strips.append(self)
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, index, value):
+        offset = index * self.bpp
+        for i in range(self.bpp):
+            self.buf[offset + self.ORDER[i]] = value[i]
+
+    def __getitem__(self, index):
+        offset = index * self.bpp
+        return tuple(self.buf[offset + self.ORDER[i]] for i in range(self.bpp))
+
+    def fill(self, value):
+        for i in range(self.n):
+            self[i] = value
+
+    def clear(self):
+        self.buf[:] = bytes(len(self.buf))
+        self.show()
+
+    def write_time(self):
+        '''Time (in seconds) to write the buffer to a real strip.'''
+        return (len(self.buf) * 8 * self.bit_us + self.latch_us) / 1000000
+
+    def show(self):
+        start = _time()
+        self._shown = bytes(self.buf)
+        if NeoPixel.render == 'log':
+            self.frames_log.append((ticks_ms(), self._shown))
+        elif NeoPixel.render == 'tk':
+            self._uptodate = False
+        # data sent to the strip (interrupts disabled on the board)
+        if NeoPixel.timing:
+            end = start + self.write_time()
+            while _time() < end:
+                pass
+        self.show_count += 1
+        self.show_time += _time() - start
+
+    write = show
+
+    # ============ functions in main thread ============
+    def update_canvas(self, tk):
+        '''Draw the last frame shown in a window of the screen thread.'''
+        self._uptodate = True
+        led_size = 20
+        if self._window is None:
+            self._window = Toplevel(tk)
+            self._window.title('NeoPixel (%d leds)' % self.n)
+            self._window.resizable(False, False)
+            self._cv = Canvas(self._window, width=self.n * led_size,
+                              height=led_size, bg='#111111',
+                              highlightthickness=0)
+            self._cv.pack()
+            self._leds = [
+                self._cv.create_oval(i * led_size + 2, 2,
+                                     (i + 1) * led_size - 2, led_size - 2,
+                                     outline='#333333')
+                for i in range(self.n)
+            ]
+        shown = self._shown
+        for i, led in enumerate(self._leds):
+            offset = i * self.bpp
+            color = '#%02x%02x%02x' % tuple(
+                shown[offset + self.ORDER[j]] for j in range(3))
+            self._cv.itemconfig(led, fill=color)
@@ -27,13 +27,15 @@ elif sys.platform == "microbit":
     from microbit import *
     from time import sleep_ms, ticks_ms
     import radio
-    from lib_neopix import init_neopix, set_neopix, actualize_neopix, off_neopix
     set_volume(222)
 
 else:
     # platform is not supported
     raise Exception("The platform %s is not supported for [main - microbit] !"%sys.platform)
 
+# neopixel strip (simulated on the computer)
+from lib_neopix import init_neopix, set_neopix, actualize_neopix, off_neopix, add_neopix
+
 # functions for display image and emotions
 def reverse_img(image, size):
     """Return an reversed image."""
@@ -118,7 +120,7 @@ def menu_play():
     if slct == "s":
         # server
         init_neopix(30, pin0)
-        game.server(radio, set_neopix, actualize_neopix, off_neopix)
+        game.server(radio, set_neopix, actualize_neopix, off_neopix, add_neopix)
         off_neopix()
     else:
         # player
@@ -139,26 +141,29 @@ def menu_play():
 radio.on()
 radio.config(group=222)
 
-# load settings, images and check files exists
-settings_file, images_file = "settings.mtd", "images.mtd"
-data = []
-for file in [settings_file, images_file]:
+# load settings, character and check files exists
+def load_data(file, show_err=True):
+    """Load a data file, show the error if not found (or return None)."""
     # modif path
     if sys.platform in ["win32", "linux"]:
         file = os.path.join(PATH_PRJ, "data", "microbit_data", file)
     # try open file
     try:
-        data.append(data_lib.load(file))
+        return data_lib.load(file)
     # if except: show err
     except:
+        if not show_err:
+            return None
         while True:
             display.show(Image.SAD)
             sleep_ms(1000)
             display.scroll("file %s not found !"%str(file))
-settings, images = data
 
-# collect waste
-collect()
+# finish the last transaction of the tool if interrupted
+if sys.platform == "microbit":
+    data_lib.commit()
+settings_file, images_file = "settings.mtd", "images.mtd" # images.mtd : all characters (old files)
+settings = load_data(settings_file)
 
 # get character and emotion
 character = settings["character"]
@@ -174,9 +179,12 @@ old_emotion = None
 frame = 0
 posx, posy = 0,2 #posx, posy = 3,3
 
-# load character
-character_data = images[character]
-character_frames = character_data["data"]
+# load character (only his file, else in the old file of all characters)
+character_data = load_data(data_lib.character_file(character), show_err=False)
+if character_data is None:
+    character_data = load_data(images_file)[character]
+collect()
+character_frames = data_lib.Frames(character_data) # decoded frame by frame
 delay = character_data["delay"]
 nb_frames = len(character_frames)
 
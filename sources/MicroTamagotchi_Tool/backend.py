@@ -8,22 +8,350 @@
 
 # imports
 import os
+import sys
+import json
 import time
+import zlib
+import queue
+import asyncio
+import select
+import ctypes
 import logging
-from threading import Thread
+import platform
+import tempfile
+import itertools
+import subprocess
+import importlib.util
+from threading import Thread, Event, Lock
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import uflash
 
 import serial.tools.list_ports
 import pyboard as tool
+import firmware
+import bundle
+from stats import PerfStats
 
 
 # constants
-MICROPYTHON_RUNTIME = uflash._RUNTIME # micropython firmware runtime (v1 and v2)
 PATH_SRC = os.path.dirname(os.path.dirname(__file__)) # sources/
 PATH_DATA = os.path.join(os.path.dirname(PATH_SRC), "data") # data/
 PATH_SRC_MAIN_MICROBIT = os.path.join(PATH_SRC, "MicroTamagotchi") # sources/MicroTamagotchi/
 PATH_DATA_MAIN_MICROBIT = os.path.join(PATH_DATA, "microbit_data") # data/microbit_data/
+MICROBIT_USB_IDS = [(0x0D28, 0x0204)] # (vid, pid) of the microbit DAPLink interface
+PATH_RECENT_MICROBITS = os.path.join(PATH_DATA, "recent_microbits.json") # data/recent_microbits.json
+PATH_BOARD_CACHE = os.path.join(PATH_DATA, "board_cache") # data/board_cache/[serial number]/
+MT_SETTINGS_FILE = "settings.mtd" # microtamagotchi settings
+MT_JOURNAL_FILE = "journal.mtd" # files of a transaction (see data_lib.commit)
+COMMIT_OK = b"cmt ok" # printed by the commit payload if the journal is applied
+PAYLOAD_COMMIT = ( # apply the journal with data_lib.commit (inline if data_lib is merged in main)
+    "try:\n"
+    " import data_lib\n"
+    " if data_lib.commit():print('%s')\n"
+    "except ImportError:\n"
+    " import os\n"
+    " f=open('%s')\n j=eval(f.read())\n f.close()\n" # the journal was just written by the backend
+    " for n in j:\n"
+    "  if j[n] is None:\n"
+    "   try:os.remove(n)\n"
+    "   except OSError:pass\n"
+    "  elif type(j[n]) is tuple:\n" # move a staged file
+    "   try:r=open(j[n][0])\n"
+    "   except OSError:continue\n"
+    "   f=open(n,'w')\n"
+    "   while 1:\n"
+    "    b=r.read(256)\n"
+    "    if not b:break\n"
+    "    f.write(b)\n"
+    "   f.close();r.close();os.remove(j[n][0])\n"
+    "  else:\n"
+    "   f=open(n,'w');f.write(j[n]);f.close()\n"
+    " os.remove('%s')\n"
+    " print('%s')" % (COMMIT_OK.decode(), MT_JOURNAL_FILE, MT_JOURNAL_FILE, COMMIT_OK.decode())
+)
+
+
+# microtamagotchi data files
+def import_microbit_module(name:str):
+    """Import a module of the microbit sources who also run on the computer (like data_lib)."""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(PATH_SRC_MAIN_MICROBIT, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def character_file(name:str) -> str:
+    """Get the microbit file of a character (like data_lib.character_file)."""
+    if not name or any(char in name for char in "'\"/\\\r\n"):
+        raise ValueError(f"invalid character name: {name!r}")
+    return f"ch_{name}.mtd"
+
+
+# logs
+def configure_log(console_log=False, logfile_path=None, loglevel="info"):
+    """Configure and return the backend logger."""
+    log = logging.getLogger(__name__)
+    log.setLevel("DEBUG")
+    # console log
+    if console_log:
+        logconsformat = logging.Formatter(
+            "{message}",style="{"
+        )
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(loglevel.upper())
+        console_handler.setFormatter(logconsformat)
+        log.addHandler(console_handler)
+    # file log        
+    if logfile_path is not None: # example: data/backend.log
+        logfileformat = logging.Formatter(
+            "{asctime}-{levelname}: {message}",style="{", datefmt="%H.%M.%S"
+        )
+        file_handler = logging.FileHandler(logfile_path, mode="a", encoding="utf-8")
+        file_handler.setLevel("DEBUG")
+        file_handler.setFormatter(logfileformat)
+        log.addHandler(file_handler)
+    return log
+
+
+# devices
+def list_microbit_ports(usb_ids=MICROBIT_USB_IDS) -> list:
+    """List serial ports of connected microbits (filtered by usb ids, all ports if None)."""
+    return [
+        port for port in serial.tools.list_ports.comports()
+        if usb_ids is None or (port.vid, port.pid) in usb_ids
+    ]
+
+def list_microbit_drives() -> list:
+    """List mounted microbit drives."""
+    drives = []
+    if os.name == "posix":
+        # same method than uflash, with "MICROBIT", "MICROBIT1", ...
+        mount_output = subprocess.check_output("mount").splitlines()
+        for line in mount_output:
+            volume = line.split()[2].decode("utf-8")
+            if os.path.basename(volume).startswith("MICROBIT"):
+                drives.append(volume)
+    elif os.name == "nt":
+        for disk in "DEFGHIJKLMNOPQRSTUVWXYZ":
+            if os.path.exists(f"{disk}:\\DETAILS.TXT") and os.path.exists(f"{disk}:\\MICROBIT.HTM"):
+                drives.append(f"{disk}:\\")
+    return drives
+
+def find_microbit_drive(serial_number=None):
+    """
+    Find the drive of a microbit with his usb serial number. If None, the
+    only drive mounted is used: None if many drives are mounted (the
+    microbit is unknown), never the drive of another microbit.
+    """
+    drives = list_microbit_drives()
+    if not drives:
+        return uflash.find_microbit() if serial_number is None else None
+    if serial_number is None:
+        return drives[0] if len(drives) == 1 else None
+    # usb serial number is the 'Unique ID' of DETAILS.TXT
+    for drive in drives:
+        try:
+            with open(os.path.join(drive, "DETAILS.TXT"), "r", errors="ignore") as f_details:
+                if serial_number.lower() in f_details.read().lower():
+                    return drive
+        except OSError:
+            # details not readable: only the drive alone can be used
+            if len(drives) == 1:
+                return drive
+    return None
+
+def port_serial_number(device):
+    """Get the usb serial number of a serial port (None if unknown)."""
+    for port in serial.tools.list_ports.comports():
+        if port.device == device:
+            return port.serial_number
+    return None
+
+_drives_lock = Lock()
+_drives_locks = {} # drive: lock (one hex written at a time by drive)
+
+def drive_lock(drive) -> Lock:
+    """Get the lock of a microbit drive."""
+    with _drives_lock:
+        return _drives_locks.setdefault(drive, Lock())
+
+
+# transfer progress
+class TransferProgress:
+
+    """
+    Progress of a transfer, give (phase, name, bytes done, bytes total, bytes/sec,
+    eta in seconds or None) to the callback, throttled to one call by interval
+    (except the last one).
+    """
+
+    def __init__(self, phase, name, callback, interval=0.1):
+        self.phase, self.name = phase, name
+        self.callback = callback
+        self.interval = interval
+        self.start = time.monotonic()
+        self._last_update = None
+
+    def update(self, done, total):
+        """Update the bytes done, call the callback if the interval is elapsed."""
+        now = time.monotonic()
+        if done < total and self._last_update is not None and now - self._last_update < self.interval:
+            return
+        self._last_update = now
+        elapsed = now - self.start
+        speed = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / speed if speed > 0 else None
+        self.callback(self.phase, self.name, done, total, speed, eta)
+
+
+# instrumented pyboard
+class StatsPyboard(tool.Pyboard):
+
+    """
+    Pyboard with timing spans (in stats) for entering raw repl and each exec.
+    """
+
+    def __init__(self, device, stats, **kwargs):
+        self.stats = stats
+        super().__init__(device, **kwargs)
+
+    def enter_raw_repl(self, *args, **kwargs):
+        with self.stats.span("enter_raw_repl"):
+            return super().enter_raw_repl(*args, **kwargs)
+
+    def exec_raw(self, *args, **kwargs):
+        try:
+            with self.stats.span("exec"):
+                return super().exec_raw(*args, **kwargs)
+        except Exception:
+            self.stats.count("exec_failures")
+            raise
+
+
+# devices watch
+class DeviceWatcher:
+
+    """
+    Watch serial devices attach / detach, with inotify on linux (no polling) 
+    and a low frequency polling on other platforms. Many listeners can share
+    a watcher (like the sessions of a fleet).
+    """
+
+    IN_CREATE, IN_DELETE = 0x100, 0x200 # inotify events
+
+    def __init__(self, on_attach=None, on_detach=None, usb_ids=MICROBIT_USB_IDS, poll_interval=1):
+        self._listeners = [] # (on_attach, on_detach)
+        if on_attach is not None or on_detach is not None:
+            self.add_listener(on_attach, on_detach)
+        self.usb_ids = usb_ids
+        self.poll_interval = poll_interval
+        self.log = logging.getLogger(__name__)
+        self._ports = {} # device: port info
+        self._stop = Event()
+        self._stop_r, self._stop_w = os.pipe() # wake up select at stop
+        self._pipe_lock = Lock()
+        self._pipe_closed = False
+        self._th_watch = Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        """Start to watch devices."""
+        self._ports = {port.device: port for port in list_microbit_ports(self.usb_ids)}
+        self._th_watch.start()
+        return self
+
+    def stop(self):
+        """Stop to watch devices (the stop pipe is closed by the watch thread, or here if not started)."""
+        with self._pipe_lock:
+            if not self._pipe_closed:
+                os.write(self._stop_w, b"\0")
+        self._stop.set()
+        if not self._th_watch.is_alive():
+            self._close_pipe()
+
+    def _close_pipe(self):
+        """Close both ends of the stop pipe (once)."""
+        with self._pipe_lock:
+            if self._pipe_closed:
+                return
+            self._pipe_closed = True
+            os.close(self._stop_r)
+            os.close(self._stop_w)
+
+    def add_listener(self, on_attach=None, on_detach=None):
+        """Add attach / detach callbacks."""
+        self._listeners.append((on_attach, on_detach))
+
+    def remove_listener(self, on_attach=None, on_detach=None):
+        """Remove attach / detach callbacks."""
+        if (on_attach, on_detach) in self._listeners:
+            self._listeners.remove((on_attach, on_detach))
+
+    def ports(self) -> list:
+        """Get infos of attached ports."""
+        return list(self._ports.values())
+
+    def _emit(self, event, port):
+        """Call the callbacks of an event (0: attach, 1: detach) of all listeners."""
+        for listener in list(self._listeners):
+            callback = listener[event]
+            if callback is None:
+                continue
+            try:
+                callback(port)
+            except Exception as err:
+                self.log.debug(f"device event failed ({type(err).__name__}: {err})")
+
+    def _rescan(self):
+        """Compare attached ports with the last scan and emit events."""
+        ports = {port.device: port for port in list_microbit_ports(self.usb_ids)}
+        for device in set(self._ports) - set(ports):
+            self.log.debug(f"[{device}] detached")
+            self._emit(1, self._ports[device])
+        for device in set(ports) - set(self._ports):
+            self.log.debug(f"[{device}] attached")
+            self._emit(0, ports[device])
+        self._ports = ports
+
+    def _inotify_dev(self):
+        """Watch /dev with inotify, return the fd (None if not available)."""
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init()
+            if fd < 0:
+                return None
+            if libc.inotify_add_watch(fd, b"/dev", self.IN_CREATE | self.IN_DELETE) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _watch(self):
+        """Main watch function."""
+        fd = self._inotify_dev()
+        # polling fallback
+        if fd is None:
+            self.log.debug("devices watch -> polling")
+            try:
+                while not self._stop.wait(self.poll_interval):
+                    self._rescan()
+            finally:
+                self._close_pipe()
+            return
+        # inotify, rescan only if a tty changed in /dev
+        self.log.debug("devices watch -> inotify")
+        try:
+            while not self._stop.is_set():
+                readable, _, _ = select.select([fd, self._stop_r], [], [])
+                if self._stop_r in readable:
+                    break
+                if b"tty" in os.read(fd, 4096):
+                    self._rescan()
+        finally:
+            os.close(fd)
+            self._close_pipe()
 
 
 # Connect Backend
@@ -35,6 +363,13 @@ class MicroBit_Backend:
 
     image_sync = "00000:00000:90909:00000:00000:"
 
+    # commands priorities (lower is executed first)
+    PRIORITY_USER = 0
+    PRIORITY_SYNC = 10
+    PRIORITY_EXIT = 100
+
+    PROBE_TIMEOUTS = (0.5, 3) # staged timeouts (in seconds) for enter raw repl
+
     def __init__(
             self, 
             show_conn_stat=None, 
@@ -42,24 +377,41 @@ class MicroBit_Backend:
             console_log=False,
             logfile_path=None,
             loglevel="info",
-            check_platform=True
+            check_platform=True,
+            device=None,
+            auto_reconnect=False,
+            show_progress=None,
+            stats_path=None,
+            watcher=None
         ):
         self._show_conn_stat = show_conn_stat
+        self._show_progress = show_progress
         self._send_sync_payload = send_sync
         self.check_platform = check_platform
         self.connected, self.connecting, self.connect_failed = False, False, False
         self.flashed, self.flashing, self.flash_failed = False, False, False
         self.flash_hex_info = (None, None, None)
+        self.progress_info = None # last (phase, name, done, total, speed, eta) of a transfer
         self.restart_after_flash = False
         self.microbit = None
-        self.port = None
+        self.device = device # only connect this port if not None
+        self.port = device
+        self.serial_number = port_serial_number(device) if device is not None else None
+        self.auto_reconnect = auto_reconnect # reconnect the same microbit if replugged
+        self._lost_serial_number = None
+        self._recent_serials = self._load_recent_serials() # serial numbers of the last connected microbits
+        self._cache_valid = set() # board files with a valid local cache (since connected)
         self.version = None
         self.restarted = False
-        self._cmd = None
-        self._cmd_data = None
-        self._cmd_return = None
-        self._in_exec = False
+        self._cmd_queue = queue.PriorityQueue()
+        self._cmd_seq = itertools.count() # keep fifo order for same priority
         self._exit = False
+        self._connect_stopped = Event()
+        self.stats = PerfStats(stats_path, info={ # spans and counters (JSON lines in stats_path)
+            "host": platform.platform(),
+            "python": platform.python_version(),
+            "uflash": uflash.get_version(),
+        })
         self.backend_cmds = [
             # if c (or 'connect') called here, microbit already connected
             (["connect", "c"], lambda: self.log.info("-> already connected"), None),
@@ -67,8 +419,10 @@ class MicroBit_Backend:
             (["disconnect", "d", "close"], self._close, None),
             (["restart", "rsta"], self._restart, None),
             (["reset", "rst"], self._reset, ["restart"]),
-            (["exec", "ex"], "exec", ["command"]),
-            (["execfile", "exf"], "execfile", ["filename"]),
+            (["flash", "f"], self._reset, ["restart"]), # also if not connected
+            (["bundle", "bd"], self._bundle, None), # also if not connected
+            (["exec", "ex"], self._exec, ["command"]),
+            (["execfile", "exf"], self._execfile, ["filename"]),
     #        (["time", "t"], "get_time", None), # not work correctly
             (["exists", "exs"], "fs_exists", ["src"]),
             (["listdir", "ls"], "fs_listdir", None),
@@ -78,45 +432,36 @@ class MicroBit_Backend:
             (["ct", "cat", "ct"], "fs_cat", ["src","chunk_size"]),
     #        (["read_file", "rf"], "fs_readfile", ["src","chunk_size"]), # not work correctly
     #        (["write_file", "wf"], "fs_writefile", ["src","chunk_size"]), # not work correctly
-            (["copy", "cp"], "fs_cp", ["src","dest"]),
-            (["get", "g"], "fs_get", ["src","dest"]),
-            (["put", "p"], "fs_put", ["src"]),
-            (["remove", "rm"], "fs_rm", ["src"]),
-            (["touch", "th"], "fs_touch", ["src"])
+            (["copy", "cp"], self._fs_cp, ["src","dest"]),
+            (["get", "g"], self._fs_get, ["src","dest"]),
+            (["put", "p"], self._fs_put, ["src"]),
+            (["read", "rd"], self._fs_read, ["src"]),
+            (["write", "wr"], self._fs_write, ["dest","data"]),
+            (["commit", "cmt"], self._fs_commit, ["changes"]),
+            (["upsert", "ups"], self._upsert_character, ["name","character","settings"]),
+            (["delete", "del"], self._delete_character, ["name","settings"]),
+            (["checksum", "cks"], "fs_checksum", ["src"]),
+            (["remove", "rm"], self._fs_rm, ["src"]),
+            (["touch", "th"], "fs_touch", ["src"]),
+            (["stats", "sts"], self._stats, ["format"]), # also if not connected
         ]
         # configure logger
-        self.log = logging.getLogger(__name__)
-        self.log.setLevel("DEBUG")
-        # console log
-        if console_log:
-            logconsformat = logging.Formatter(
-                "{message}",style="{"
-            )
-            console_handler = logging.StreamHandler()
-            console_handler.setLevel(loglevel.upper())
-            console_handler.setFormatter(logconsformat)
-            self.log.addHandler(console_handler)
-        # file log        
-        if logfile_path is not None: # example: data/backend.log
-            logfileformat = logging.Formatter(
-                "{asctime}-{levelname}: {message}",style="{", datefmt="%H.%M.%S"
-            )
-            file_handler = logging.FileHandler(logfile_path, mode="a", encoding="utf-8")
-            file_handler.setLevel("DEBUG")
-            file_handler.setFormatter(logfileformat)
-            self.log.addHandler(file_handler)
+        self.log = configure_log(console_log, logfile_path, loglevel)
         # main thread
         self._th_backend = Thread(
             target=self._backend
         )
-        # sync thread
-        self._th_backend_show_sync = Thread(
-            target=self._backend_show_sync, 
-            daemon=True
-        )
+        # devices watch (for detect the microbit disconnected), shared if given (started by his owner)
+        self._own_watcher = watcher is None
+        if self._own_watcher:
+            self._watcher = DeviceWatcher(usb_ids=None)
+        else:
+            self._watcher = watcher
+        self._watcher.add_listener(self._on_attach, self._on_detach)
         # start backend
         self._th_backend.start()
-        self._th_backend_show_sync.start()
+        if self._own_watcher:
+            self._watcher.start()
         self.log.info("Microbit Backend -> started")
         self.show_conn_stat()
 
@@ -131,6 +476,35 @@ class MicroBit_Backend:
         except Exception as err:
             self.log.debug(f"show conn stat -> failed ({type(err).__name__}: {err})")
 
+    def show_progress(self, phase, name, done, total, speed, eta):
+        """Give a transfer progress (phase, name, bytes done/total, bytes/sec, eta)."""
+        self.progress_info = (phase, name, done, total, speed, eta)
+        self.log.debug(f"{phase} {name}: {done}/{total} bytes ({speed:.0f} B/s)")
+        if self._show_progress is None:
+            return
+        try:
+            self._show_progress(*self.progress_info)
+        except Exception as err:
+            self.log.debug(f"show progress -> failed ({type(err).__name__}: {err})")
+
+    def _progress_callback(self, phase, name, progress_callback=None):
+        """
+        Get a (done, total) callback for a transfer, who give throttled progress
+        to show_progress and all progress to progress_callback (if not None).
+        """
+        progress = TransferProgress(phase, name, self.show_progress)
+        last_chunk = [time.perf_counter(), 0] # (end time, bytes done) of the last chunk
+        def callback(done, total):
+            if done > last_chunk[1]:
+                now = time.perf_counter()
+                self.stats.add_span(f"{phase}_chunk", now - last_chunk[0])
+                self.stats.count(f"bytes_{phase}", done - last_chunk[1])
+                last_chunk[:] = [now, done]
+            progress.update(done, total)
+            if progress_callback is not None:
+                progress_callback(done, total)
+        return callback
+
     def _list_ports(self, only_device=False):
         """List open ports for the serial connection."""
         serial_ports = []
@@ -141,40 +515,114 @@ class MicroBit_Backend:
                 serial_ports.append(port)
         return serial_ports
 
-    def _try_connect(self, device) -> bool:
-        """Try to connect a port."""
+    def _load_recent_serials(self) -> list:
+        """Load the serial numbers of the last connected microbits (most recent at the end)."""
         try:
-            self.log.debug(f"try to connect [{device}]")
-            self.microbit = None
-            self.microbit = tool.Pyboard(device)
-            self.port = device
-            time.sleep(1)
-        except tool.PyboardError as err:
-            self.log.warning(f"failed to connect [{device}] ({type(err).__name__}: {err})")
-            return False # used port ?
-        except:
-            pass
-        else:
+            with open(PATH_RECENT_MICROBITS, "r") as f_recent:
+                recents = json.load(f_recent)
+        except (OSError, ValueError):
+            return []
+        return recents if isinstance(recents, list) else []
+
+    def _save_recent_serials(self):
+        """Save the serial number of the connected microbit as the most recent."""
+        if self.serial_number is None:
+            return
+        if self.serial_number in self._recent_serials:
+            self._recent_serials.remove(self.serial_number)
+        self._recent_serials.append(self.serial_number)
+        try:
+            with open(PATH_RECENT_MICROBITS, "w") as f_recent:
+                json.dump(self._recent_serials, f_recent)
+        except OSError as err:
+            self.log.debug(f"can't save recent microbits ({type(err).__name__}: {err})")
+
+    def _candidate_ports(self) -> list:
+        """
+        List ports to probe, microbits first: the last port of the session, then
+        the last connected microbits (by serial number).
+        """
+        if self.device is not None:
+            return [self.device]
+        ports = list_microbit_ports()
+        if not ports:
+            # no microbit usb ids found (unknown interface ?), try all ports
+            ports = self._list_ports()
+        recents = self._recent_serials # most recent at the end
+        def recent_first(port):
+            if port.device == self.port:
+                return -len(recents) - 1
+            if port.serial_number in recents:
+                return -recents.index(port.serial_number)
+            return 1
+        return [port.device for port in sorted(ports, key=recent_first)]
+
+    def _probe(self, device, timeout):
+        """Open a port and enter raw repl, return the pyboard (None if failed)."""
+        try:
+            self.log.debug(f"try to connect [{device}] (timeout: {timeout}s)")
+            microbit = StatsPyboard(device, self.stats)
+        except Exception as err:
+            self.log.debug(f"failed to open [{device}] ({type(err).__name__}: {err})")
+            return None # used port ?
+        try:
+            microbit.serial.timeout = timeout # don't block on a silent device
+            microbit.enter_raw_repl(timeout=timeout)
+            microbit.serial.timeout = None
+        except Exception:
+            self.log.debug(f"connecting to [{device}] failed")
+            self.stats.count("probe_failures")
             try:
-                self.microbit.enter_raw_repl()
-                self.log.debug(f"connected to [{device}]")
-                return True # open port
+                microbit.close()
             except:
-                self.log.debug(f"connecting to [{device}] failed")
-                return False # board program wait something ...
-        self.microbit, self.port, self.version = None, None, None
-        return None # no port
+                pass
+            return None # not a micropython board or board program wait something ...
+        return microbit
+
+    def _release(self, microbit):
+        """Close a probed pyboard not used, and restart his program."""
+        try:
+            microbit.exit_raw_repl()
+            microbit.reset(soft=True)
+            microbit.close()
+        except:
+            pass
+
+    def _probe_ports(self, devices):
+        """
+        Probe ports in parallel with staged timeouts, return (device, pyboard)
+        of the first answering in the order of devices.
+        """
+        for stage, timeout in enumerate(self.PROBE_TIMEOUTS):
+            if not devices or not self.connecting:
+                break
+            if stage > 0:
+                self.stats.count("probe_retries")
+            with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+                probed = list(pool.map(lambda device: self._probe(device, timeout), devices))
+            found = None
+            for device, microbit in zip(devices, probed):
+                if microbit is None:
+                    continue
+                if found is None:
+                    found = (device, microbit)
+                else:
+                    self._release(microbit)
+            if found is not None:
+                return found
+        return None, None
 
     def _connect(self, wait_if_not_conn=True) -> bool:
         """Create serial connexion with the microbit, return True if sucess."""
-        # try connect old port
-        connected = False
-        if self._try_connect(self.port):
-            connected = True
-        # try connect to each port
-        for port in self._list_ports():
-            if self._try_connect(port.device):
-                connected = True        
+        self._connect_stopped.clear()
+        self.microbit = None
+        devices = self._candidate_ports()
+        with self.stats.span("connect"):
+            # probe all ports together, the last connected is chosen first if it answers
+            self.port, self.microbit = self._probe_ports(devices)
+        connected = self.microbit is not None
+        if connected:
+            self.log.debug(f"connected to [{self.port}]")
 
         # check if microbit connected
         if self.connecting and connected: # (if self.connecting=False: aborted)
@@ -183,18 +631,25 @@ class MicroBit_Backend:
             if self.check_platform and platform != "microbit":
                 self.log.warning(f"backend can don't work with '{platform}' platform !")
             self.version = self.microbit.fs_version()
+            self.stats.info["board_version"] = self.version
+            for port in self._list_ports():
+                if port.device == self.port:
+                    self.serial_number = port.serial_number
+            self._save_recent_serials()
             self.connected = True
             self.connect_failed = False
             self.restarted = False
+            self._lost_serial_number = None
+            self._cache_valid.clear()
+            self._send_sync()
         else:
             # some wait if no port found (for app)
             if wait_if_not_conn:
-                start = time.time()
-                while self.connecting and time.time() - start < 2:
-                    time.sleep(0.05)
+                self._connect_stopped.wait(2)
                 self.log.info(f"-> no device to connect found !")
             self._close()
             self.connect_failed = True
+            self.stats.count("connect_failures")
 
         # show new connexion status
         self.connecting = False
@@ -222,19 +677,23 @@ class MicroBit_Backend:
         self.version = None
         self.restarted = True
 
-    def _save_hex_callback(self, src:str, dest:str):
-        """Write a file with progress callback."""
+    def _save_hex_callback(self, src:str, dest:str, chunk_size=16384):
+        """Write a file with progress in self.flash_hex_info (and transfer progress)."""
         src_size = os.stat(src).st_size
         written = 0
-        data_len = 1
+        self.flash_hex_info = ("hex", written, src_size)
+        progress_callback = self._progress_callback("hex", os.path.basename(dest))
+        progress_callback(written, src_size)
         with open(src, 'rb') as f_src:
             with open(dest, 'wb') as f_dest:
-                while data_len:
-                    data = f_src.read(256)
+                while True:
+                    data = f_src.read(chunk_size)
+                    if not data:
+                        break
                     f_dest.write(data)
-                    data_len = len(data)
-                    written += data_len
-    #                self.flash_hex_info = ("hex", written, src_size)
+                    written += len(data)
+                    self.flash_hex_info = ("hex", written, src_size)
+                    progress_callback(written, src_size)
                 f_dest.flush()
                 os.fsync(f_dest.fileno())
 
@@ -248,44 +707,85 @@ class MicroBit_Backend:
         if not os.path.exists(os.path.join(PATH_SRC_MAIN_MICROBIT, "main.py")):
             self.log.error("-> failed - 'main.py' file not found !")
             self.flashing, self.flash_failed = False, True; return
-        # generate fs hex code based on runtime and script (for v1 et v2) 
-        temp_script = "pass".encode('utf-8')
-        hex_code = uflash.embed_fs_uhex(MICROPYTHON_RUNTIME, temp_script)
+        # get fs hex based on runtime and all project files (for v1 et v2) bundled, built
+        # once, with modules precompiled to .mpy for the versions that support it
+        with self.stats.span("reset.build_hex"):
+            files = firmware.project_files()
+            try:
+                files = self._bundle(files)
+            except (ValueError, OSError) as err:
+                self.log.warning(f"files not bundled, sources are used ({err})")
+            try:
+                hex_path, precompiled = firmware.build_precompiled_hex(files)
+                files_in_hex = True
+            except ValueError as err:
+                # files are uploaded after flash with the initial script
+                self.log.warning(f"files not embedded in the firmware, uploaded by serial after the flash ({err})")
+                if not all(firmware.mpy_cross_available(version) for version in firmware.MPY_CROSS_MODULES):
+                    self.log.warning("install mpy-cross-v5 (requirements.txt) for precompile the modules, they fit in the firmware")
+                hex_path = firmware.build_hex([("main.py", "pass".encode('utf-8'))])
+                precompiled, files_in_hex = [], False
         # get microbit path
         self.log.debug("find microbit ...")
-        microbit_path = uflash.find_microbit()
+        if self.serial_number is None and self.device is not None:
+            self.serial_number = port_serial_number(self.device)
+        microbit_path = find_microbit_drive(self.serial_number)
         if microbit_path is None:
-            self.log.error("-> failed - microbit not connected !")
+            if self.serial_number is None and len(list_microbit_drives()) > 1:
+                self.log.error("-> failed - many microbits mounted, the microbit to flash is unknown !")
+            else:
+                self.log.error("-> failed - microbit not connected !")
             self.flashing, self.flash_failed = False, True; return
 
-        # flash micropython filesystem on the microbit with the initial script
-        self.log.debug("save .hex firmware into 'data' folder and in microbit ...")
-        # save firmware
-        firmware_path = os.path.join(PATH_DATA, "micropython.hex")
-        with open(firmware_path, 'wb') as output:
-            output.write(hex_code.encode('ascii'))
-        # flash firmware
+        # flash micropython filesystem on the microbit (the board reboot after)
+        self.log.debug("save .hex firmware in microbit ...")
+        if self.connected:
+            self._close()
         microbit_path = os.path.join(microbit_path, "micropython.hex")
-        self._save_hex_callback(firmware_path, microbit_path)
-        uflash.save_hex(hex_code, microbit_path)
+        with self.stats.span("reset.write_hex"), drive_lock(microbit_path):
+            self._save_hex_callback(hex_path, microbit_path)
+        self.flash_hex_info = (None, None, None)
+
+        # the board is ready, reconnect only for stay connected or check precompiled modules
+        if files_in_hex:
+            self.log.info("-> microbit filsystem updated with firmware and data")
+            if precompiled or not (restart and self.restart_after_flash):
+                self.log.debug("reconnect microbit ...")
+                self.connecting = True
+                with self.stats.span("reset.reconnect"):
+                    self._connect()
+                if not self.connected:
+                    self.log.error("-> failed - microbit flashed was disconnected !")
+                    self.flashing, self.flash_failed = False, True; return
+                if precompiled and self.version in firmware.MPY_CROSS_MODULES:
+                    try:
+                        with self.stats.span("reset.check_precompiled"):
+                            self._check_precompiled(precompiled, files)
+                    except Exception as err:
+                        self.log.error(f"-> failed to check precompiled modules ! ({type(err).__name__}: {err})")
+                        self.flashing, self.flash_failed = False, True; return
+                if restart and self.restart_after_flash:
+                    self._restart()
+            self.flashed, self.flashing, self.flash_failed = True, False, False
+            return
 
         # reconnect microbit and check if the same is connected
         self.log.debug("reconnect microbit ...")
         self.connecting = True
-        self._connect()
+        with self.stats.span("reset.reconnect"):
+            self._connect()
         if not self.connected:
             self.log.error("-> failed - microbit to reset was disconnected !")
             self.flashing, self.flash_failed = False, True; return
         # send files to fs
         self.log.debug("send files to filesystem ...")
-        time.sleep(0.5)
         try:
-            # write files
-            for base_path in [PATH_SRC_MAIN_MICROBIT, PATH_DATA_MAIN_MICROBIT]:
-                for file_or_dir in os.listdir(base_path):
-                    path = os.path.join(base_path, file_or_dir)
-                    if os.path.isfile(path):
-                        self.microbit.fs_put(path)
+            # write files (modules precompiled for the microbit version if possible)
+            compiled_files = firmware.precompile_files(files, self.version)
+            with self.stats.span("reset.upload"):
+                self._put_files(compiled_files)
+            with self.stats.span("reset.check_precompiled"):
+                self._check_precompiled(firmware.precompiled_modules(compiled_files), files)
 
         except Exception as err:
             self.log.error(f"-> failed to upload files into fs ! ({type(err).__name__}: {err})")
@@ -298,6 +798,205 @@ class MicroBit_Backend:
             self._restart()
         self.flashed, self.flashing, self.flash_failed = True, False, False
 
+    def _bundle(self, files=None):
+        """
+        Build the deployment bundle of the project files (minified), save it and
+        log his size report, return the bundle files (list of (name, data)).
+        """
+        files = firmware.project_files() if files is None else files
+        bundle_files = bundle.build_bundle(files)
+        bundle.save_bundle(bundle_files)
+        self.log.info("bundle size report [source -> bundle]:")
+        for name, src_size, bundle_size in bundle.bundle_report(files, bundle_files):
+            self.log.info(f"- {name}: {src_size} -> {'merged' if bundle_size is None else bundle_size} bytes")
+        return bundle_files
+
+    def _stats(self, fmt="prometheus"):
+        """Get the performance stats ('prometheus' or 'json' format), or 'reset' them."""
+        if fmt == "reset":
+            self.stats.reset()
+            return "-> stats reset"
+        if fmt == "json":
+            return self.stats.to_json()
+        return self.stats.to_prometheus()
+
+    def _fs_put(self, src, chunk_size=256, progress_callback=None):
+        """Put a computer file in the microbit with transfer progress."""
+        self._cache_valid.discard(os.path.basename(src))
+        callback = self._progress_callback("put", os.path.basename(src), progress_callback)
+        return self.microbit.fs_put(src, int(chunk_size), callback)
+
+    def _fs_get(self, src, dest=None, chunk_size=1024, progress_callback=None):
+        """Get a file from the microbit with transfer progress."""
+        callback = self._progress_callback("get", src, progress_callback)
+        return self.microbit.fs_get(src, dest, int(chunk_size), callback)
+
+    def _fs_cp(self, src, dest):
+        """Copy a microbit file to another microbit file (the cache of dest is no longer valid)."""
+        self._cache_valid.discard(dest)
+        return self.microbit.fs_cp(src, dest)
+
+    def _fs_rm(self, src):
+        """Remove a microbit file (and his local cache)."""
+        self._remove_cache_file(src)
+        return self.microbit.fs_rm(src)
+
+    def _exec(self, command):
+        """Exec code on the microbit (it can change any file: the whole cache is no longer valid)."""
+        self._cache_valid.clear()
+        return self.microbit.exec(command)
+
+    def _execfile(self, filename):
+        """Exec a computer file on the microbit (it can change any file: the whole cache is no longer valid)."""
+        self._cache_valid.clear()
+        return self.microbit.execfile(filename)
+
+    def _cache_path(self, name=None) -> str:
+        """Get the local cache directory of the connected microbit (or a file path in it)."""
+        cache_dir = os.path.join(PATH_BOARD_CACHE, str(self.serial_number or "unknown"))
+        return cache_dir if name is None else os.path.join(cache_dir, name)
+
+    def _load_cache_index(self) -> dict:
+        """Load (size, checksum) of the cached files of the connected microbit."""
+        try:
+            with open(self._cache_path("index.json"), "r") as f_index:
+                return json.load(f_index)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache_file(self, name, data:bytes):
+        """Save a file in the local cache of the connected microbit (and his index)."""
+        os.makedirs(self._cache_path(), exist_ok=True)
+        with open(self._cache_path(name), "wb") as f_cache:
+            f_cache.write(data)
+        index = self._load_cache_index()
+        index[name] = [len(data), zlib.adler32(data)]
+        with open(self._cache_path("index.json"), "w") as f_index:
+            json.dump(index, f_index)
+
+    def _fs_read(self, src) -> bytes:
+        """
+        Read a microbit file through the local cache: validated once by connection
+        with the size and checksum from the microbit, downloaded if changed.
+        """
+        cache_path = self._cache_path(src)
+        if src in self._cache_valid and os.path.exists(cache_path):
+            self.stats.count("cache_hits")
+        else:
+            cached = self._load_cache_index().get(src)
+            if (cached is not None and os.path.exists(cache_path)
+                    and tuple(cached) == self.microbit.fs_checksum(src)):
+                self.stats.count("cache_validations")
+            else:
+                self.stats.count("cache_misses")
+                os.makedirs(self._cache_path(), exist_ok=True)
+                self._fs_get(src, cache_path)
+                with open(cache_path, "rb") as f_cache:
+                    self._save_cache_file(src, f_cache.read())
+            self._cache_valid.add(src)
+        with open(cache_path, "rb") as f_cache:
+            return f_cache.read()
+
+    def _fs_write(self, dest, data):
+        """Write data (bytes or str) in a microbit file and in his local cache (write-through)."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._save_cache_file(dest, data)
+        self._fs_put(self._cache_path(dest))
+        self._cache_valid.add(dest)
+
+    def _remove_cache_file(self, name):
+        """Remove a file from the local cache of the connected microbit (and his index)."""
+        self._cache_valid.discard(name)
+        index = self._load_cache_index()
+        if index.pop(name, None) is not None:
+            with open(self._cache_path("index.json"), "w") as f_index:
+                json.dump(index, f_index)
+        if os.path.exists(self._cache_path(name)):
+            os.remove(self._cache_path(name))
+
+    def _fs_commit(self, changes:dict) -> bool:
+        """
+        Write, remove and move microbit files (dict of name: data, None for
+        remove, (staged file,) for move a file written before) in one
+        transaction: a journal is put then applied by one exec, and applied at
+        the boot by data_lib.commit if interrupted. The local cache is updated
+        only if the microbit confirms the commit, else PyboardError is raised.
+        """
+        changes = {
+            name: data.decode("utf-8") if isinstance(data, bytes) else data
+            for name, data in changes.items()
+        }
+        self._put_files([(MT_JOURNAL_FILE, repr(changes).encode("utf-8"))])
+        output = self.microbit.exec(PAYLOAD_COMMIT)
+        if COMMIT_OK not in [line.strip() for line in output.splitlines()]:
+            for name, data in changes.items():
+                self._cache_valid.discard(name) # revalidated by checksum at the next read
+                if isinstance(data, tuple):
+                    self._cache_valid.discard(data[0])
+            raise tool.PyboardError(f"commit not applied by the microbit ({output!r})")
+        for name, data in changes.items():
+            if data is None:
+                self._remove_cache_file(name)
+            elif isinstance(data, tuple):
+                staged_path = self._cache_path(data[0])
+                if data[0] in self._cache_valid and os.path.exists(staged_path):
+                    with open(staged_path, "rb") as f_cache:
+                        self._save_cache_file(name, f_cache.read())
+                    self._cache_valid.add(name)
+                else:
+                    self._remove_cache_file(name)
+                self._remove_cache_file(data[0])
+            else:
+                self._save_cache_file(name, data.encode("utf-8"))
+                self._cache_valid.add(name)
+        return True
+
+    def _upsert_character(self, name, character:dict, settings:dict=None) -> bool:
+        """Insert or replace a character (and the settings) in one transaction."""
+        changes = {character_file(name): repr(character)}
+        if settings is not None:
+            changes[MT_SETTINGS_FILE] = repr(settings)
+        return self._fs_commit(changes)
+
+    def _delete_character(self, name, settings:dict=None) -> bool:
+        """Remove a character (and write the settings) in one transaction."""
+        changes = {character_file(name): None}
+        if settings is not None:
+            changes[MT_SETTINGS_FILE] = repr(settings)
+        return self._fs_commit(changes)
+
+    def _put_files(self, files):
+        """Put files (list of (name, data)) in the microbit filesystem."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name, data in files:
+                path = os.path.join(temp_dir, name)
+                with open(path, "wb") as f_temp:
+                    f_temp.write(data)
+                self._fs_put(path)
+
+    def _check_precompiled(self, modules, files):
+        """
+        Check that the precompiled modules can be imported by the microbit (one
+        by soft reset, for a free heap), else replace them by their source (from
+        files, list of (name, data)) only if the .mpy version is not supported.
+        """
+        sources = dict(files)
+        for module in modules:
+            self.microbit.enter_raw_repl() # soft reset
+            try:
+                self.microbit.exec(f"import {module}")
+            except tool.PyboardError as err:
+                if "incompatible .mpy" not in str(err):
+                    # like a MemoryError, the source would not be better
+                    self.log.warning(f"precompiled '{module}' kept, import failed ({err})")
+                    continue
+                self.log.warning(f"precompiled '{module}' not supported, use source ({err})")
+                self.microbit.fs_rm(f"{module}.mpy")
+                self._put_files([(f"{module}.py", sources[f"{module}.py"])])
+            else:
+                self.log.debug(f"precompiled '{module}' imported")
+
     def _help_cmds(self):
         """Print all available commands."""
         self.log.info("\nCommands [command (alias): args] :")
@@ -308,124 +1007,368 @@ class MicroBit_Backend:
                 txt_cmd += f": {', '.join([i for i in args])}"
             self.log.info(txt_cmd)
 
-    def _exec_cmd(self, payload=None):
-        """Execute self._cmd with self._cmd_data."""
-        self._in_exec = True
+    def _exec_cmd(self, cmd, cmd_data=None):
+        """Execute a cmd with his data and return the result."""
+        for cmds, cmd_funct, _ in self.backend_cmds:
+            if cmd in cmds:
+                self.log.debug(f"exec cmd '{cmd}' with args {cmd_data}")
+                if not callable(cmd_funct):
+                    cmd_funct = getattr(self.microbit, cmd_funct)
+                if cmd_data is None:
+                    return cmd_funct()
+                return cmd_funct(*cmd_data)
+        return f"-> cmd {cmd} not found"
+
+    def _sync(self):
+        """Show the sync image on the microbit screen, disconnect if failed."""
         if self.connected:
-            # try exec src code in microbit
-            if payload:
-                self.log.debug(f"exec payload '{payload}'")
-                self.microbit.exec(payload)
-            # try to exec a pyboard cmd or a self function
-            else:
-                try:
-                    for cmds, cmd_funct, _ in self.backend_cmds:
-                        if self._cmd in cmds:
-                            self.log.debug(f"exec cmd '{self._cmd}' with args {self._cmd_data}")
-                            if not callable(cmd_funct):
-                                cmd_funct = getattr(self.microbit, cmd_funct)
-                            if self._cmd_data is None:
-                                self._cmd_return = cmd_funct()
-                            else:
-                                self._cmd_return = cmd_funct(*self._cmd_data)
-                            break
-                    else:
-                        self._cmd_return = f"-> cmd {self._cmd} not found"
-                except Exception as err:
-                    self.log.error(f"failed to exec cmd ({type(err).__name__}: {err})")
-        self._in_exec = False
-
-    def _wait_not_in_exec(self):
-        """Wait last cmd executed."""
-        while self._in_exec:
-            time.sleep(0.05)
+            payload_sync = f"from microbit import display, Image;display.show(Image('{self.image_sync}'))"
+            self.log.debug(f"exec payload '{payload_sync}'")
+            try:
+                self.microbit.exec(payload_sync)
+            except:
+                self._close()
+                self.show_conn_stat()
 
-    def _backend(self):
-        """Main backend function."""
-        while not self._exit:
-            # exec cmd
-            self._cmd_return = None
-            if self._cmd != None:
-                if self._cmd in ["h", "help"]:
-                    self._help_cmds()
-                else:
-                    if self.connected:
-                        self._wait_not_in_exec()
-                        self._exec_cmd()
-                    else:
-                        if self._cmd in ["c", "connect"]:
-                            self.connecting = True
-
-            # try connect
-            if self.connecting:
-                self._connect()
+    def _run_cmd(self, cmd, cmd_data):
+        """Run a cmd taken from the queue, return the result."""
+        if cmd in ["h", "help"]:
+            self._help_cmds()
+        elif cmd == "_sync":
+            self._sync()
+        elif cmd in ["flash", "f"]:
+            # flash not need a connected microbit
+            self.flashing = True
+            self.show_conn_stat()
+            try:
+                with self.stats.span("reset"):
+                    self._reset(*(cmd_data or ()))
+            except:
+                self.flash_failed = True
+                raise
+            finally:
+                self.flashing = False
                 self.show_conn_stat()
-            # try flash
-            elif self.flashing:
-                self._reset()
+        elif cmd in ["bundle", "bd"]:
+            # bundle not need a connected microbit
+            return self._bundle()
+        elif cmd in ["stats", "sts"]:
+            return self._stats(*(cmd_data or ()))
+        elif cmd == "_lost":
+            self._lost_serial_number = self.serial_number
+            self._close()
+            self.show_conn_stat()
+        elif cmd == "_reconnect":
+            # fast reconnect, the device was just attached
+            if not self.connected:
+                self.stats.count("reconnects")
+                self.port = cmd_data[0]
+                self.connecting = True
                 self.show_conn_stat()
+                self._connect(wait_if_not_conn=False)
+                self.show_conn_stat()
+        elif self.connected:
+            return self._exec_cmd(cmd, cmd_data)
+        elif cmd in ["c", "connect"]:
+            self.connecting = True
+            self.show_conn_stat()
+            self._connect()
+            self.show_conn_stat()
+        else:
+            self.log.debug(f"-> cmd '{cmd}' ignored, not connected")
 
-            # reset cmd
-            self._cmd = None
-
-            # sleep a little
-            time.sleep(0.05)
+    def _backend(self):
+        """Main backend function, execute cmds of the queue one by one."""
+        while True:
+            _, _, (cmd, cmd_data, future) = self._cmd_queue.get()
+            if cmd == "_exit":
+                future.set_running_or_notify_cancel()
+                future.set_result(None)
+                break
+            # skip cancelled cmds
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._run_cmd(cmd, cmd_data))
+            except Exception as err:
+                self.log.error(f"failed to exec cmd ({type(err).__name__}: {err})")
+                future.set_exception(err)
 
-        # close serial connexion at the end
+        # cancel cmds not executed and close serial connexion at the end
+        self.cancel_cmds()
         self._close()
 
-    def _backend_show_sync(self):
-        """Backend for show an image on the microbit screen during connection."""
-        need_resync = True
-        payload_sync = f"from microbit import display, Image;display.show(Image('{self.image_sync}'))"
+    def _on_detach(self, port):
+        """Disconnect if the port of the microbit is detached."""
+        if self.connected and port.device == self.port:
+            self.submit("_lost")
 
-        # main sync backend loop
-        while not self._exit:
-            # sleep a little
-            time.sleep(0.1)
+    def _on_attach(self, port):
+        """Reconnect the last lost microbit if attached."""
+        if self.auto_reconnect and not self.connected and self._lost_serial_number is not None:
+            if port.serial_number == self._lost_serial_number:
+                self.submit("_reconnect", (port.device,))
 
-            if self.connected:
-                if need_resync and self._send_sync_payload:
-                    # resync image
-                    need_resync = False
-                    try:
-                        self._wait_not_in_exec()
-                        self._exec_cmd(payload_sync)
-                    except:
-                        pass
-                    else:
-                        continue
-                else:
-                    # check if self.port in computer connected ports
-                    if self.port in self._list_ports(True):
-                        continue
-                # disconnect if this stage reached
-                self._close()
-                self.show_conn_stat()
+    def _send_sync(self):
+        """Queue the sync image payload, after all user cmds."""
+        if self._send_sync_payload:
+            self.submit("_sync", priority=self.PRIORITY_SYNC)
 
-            else:
-                # if microbit was disconnected, resync image needed
-                need_resync = True
+    def submit(self, cmd, cmd_data=None, priority=None) -> Future:
+        """Queue a cmd to execute at the backend, return his future."""
+        if priority is None:
+            priority = self.PRIORITY_USER
+        future = Future()
+        if self._exit:
+            future.cancel()
+        else:
+            self._cmd_queue.put((priority, next(self._cmd_seq), (cmd, cmd_data, future)))
+        return future
+
+    def stop_connect(self):
+        """Abort the actual connexion attempt."""
+        self.connecting = False
+        self._connect_stopped.set()
+
+    def cancel_cmds(self):
+        """Cancel all cmds not yet executed."""
+        while True:
+            try:
+                _, _, (_, _, future) = self._cmd_queue.get_nowait()
+            except queue.Empty:
+                break
+            future.cancel()
 
     def send_cmd(self, cmd, cmd_data=None, wait=True):
-        """Send a cmd to execute at the backend."""
-        # TODO: cmd_stack ?
-        self._cmd = cmd
-        self._cmd_data = cmd_data
-        if wait:
-            while self._cmd != None:
-                time.sleep(0.05)
-        return self._cmd_return
+        """
+        Send a cmd to execute at the backend, return the result (or the future if
+        not wait). The exception of a failed cmd is raised.
+        """
+        future = self.submit(cmd, cmd_data)
+        if not wait:
+            return future
+        return future.result()
 
     def exit(self, wait=True):
         """Quit the backend."""
+        self.submit("_exit", priority=self.PRIORITY_EXIT)
         self._exit = True
+        self._watcher.remove_listener(self._on_attach, self._on_detach)
+        if self._own_watcher:
+            self._watcher.stop()
         if wait:
             self.log.debug("wait terminated ...")
             self._th_backend.join()
         self.log.info("Microbit Backend -> exit")
 
 
+# fleet of microbits
+class MicroBit_Fleet:
+
+    """
+    Manage many microbits at the same time, with a MicroBit_Backend session by port.
+    Cmds are executed in parallel on sessions, with a bounded number of workers.
+    """
+
+    def __init__(
+            self,
+            max_workers=8,
+            show_progress=None,
+            send_sync=True,
+            console_log=False,
+            logfile_path=None,
+            loglevel="info",
+            check_platform=True
+        ):
+        self._show_progress = show_progress
+        self._send_sync_payload = send_sync
+        self.check_platform = check_platform
+        self.sessions = {} # port: MicroBit_Backend
+        self.progress = (0, 0) # (done, total) sessions of the actual cmd
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._watcher = DeviceWatcher(usb_ids=None).start() # shared by the sessions
+        self.log = configure_log(console_log, logfile_path, loglevel)
+
+    def show_progress(self):
+        try:
+            self._show_progress(*self.progress)
+        except Exception as err:
+            self.log.debug(f"show progress -> failed ({type(err).__name__}: {err})")
+
+    def scan(self) -> list:
+        """List ports of connected microbits, with or without session."""
+        return [port.device for port in list_microbit_ports()]
+
+    def open(self) -> list:
+        """Open a session for each new microbit and connect all, return connected ports."""
+        new_ports = [port for port in self.scan() if port not in self.sessions]
+        for port in new_ports:
+            self.sessions[port] = MicroBit_Backend(
+                send_sync=self._send_sync_payload,
+                check_platform=self.check_platform,
+                device=port,
+                watcher=self._watcher
+            )
+        self.run("connect", ports=new_ports)
+        return self.connected_ports()
+
+    def connected_ports(self) -> list:
+        """List ports of connected sessions."""
+        return [port for port, session in self.sessions.items() if session.connected]
+
+    def _run_session(self, port, cmd, cmd_data):
+        """Run a cmd on a session and wait the result (in a worker)."""
+        return self.sessions[port].submit(cmd, cmd_data).result()
+
+    def run(self, cmd, cmd_data=None, ports=None) -> dict:
+        """Run a cmd on sessions in parallel, return results (or exceptions) by port."""
+        if ports is None:
+            ports = list(self.sessions)
+        futures = {
+            self._pool.submit(self._run_session, port, cmd, cmd_data): port
+            for port in ports
+        }
+        results = {}
+        self.progress = (0, len(futures))
+        self.show_progress()
+        for future in as_completed(futures):
+            port = futures[future]
+            try:
+                results[port] = future.result()
+            except Exception as err:
+                results[port] = err
+                self.log.error(f"[{port}] cmd '{cmd}' failed ({type(err).__name__}: {err})")
+            self.progress = (self.progress[0] + 1, self.progress[1])
+            self.show_progress()
+        return results
+
+    def flash(self, restart=True, ports=None) -> dict:
+        """Flash the project on sessions microbits, return flashed status by port."""
+        self.run("flash", (restart,), ports)
+        if ports is None:
+            ports = list(self.sessions)
+        return {port: self.sessions[port].flashed for port in ports}
+
+    def put(self, src, ports=None) -> dict:
+        """Put a computer file in sessions microbits."""
+        return self.run("put", (src,), ports)
+
+    def exec(self, command, ports=None) -> dict:
+        """Exec some code on sessions microbits."""
+        return self.run("exec", (command,), ports)
+
+    def close(self, ports=None):
+        """Exit sessions (all if ports is None)."""
+        if ports is None:
+            ports = list(self.sessions)
+        for port in ports:
+            self.sessions.pop(port).exit()
+
+    def exit(self):
+        """Exit all sessions and the workers."""
+        self.close()
+        self._pool.shutdown()
+        self._watcher.stop()
+        self.log.info("Microbit Fleet -> exit")
+
+
+# asyncio interface
+class AsyncMicroBitBackend:
+
+    """
+    Asyncio interface of the MicroBit_Backend, all cmds are coroutines (the
+    futures of the backend queue awaited with asyncio.wrap_future). It is an
+    awaitable facade, not an asyncio serial transport: the serial I/O stay
+    blocking in the backend thread, so each microbit still use a thread, but
+    the event loop is never blocked.
+    """
+
+    def __init__(self, backend=None, **backend_kwargs):
+        if backend is None:
+            backend = MicroBit_Backend(**backend_kwargs)
+        self.backend = backend
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.exit()
+
+    async def cmd(self, cmd, cmd_data=None, priority=None):
+        """Execute a backend cmd and return his result."""
+        return await asyncio.wrap_future(self.backend.submit(cmd, cmd_data, priority))
+
+    async def connect(self) -> bool:
+        """Connect the microbit, return True if connected."""
+        await self.cmd("connect")
+        return self.backend.connected
+
+    async def disconnect(self):
+        """Close serial connexion with the microbit."""
+        await self.cmd("disconnect")
+
+    async def restart(self):
+        """Restart the microbit."""
+        await self.cmd("restart")
+
+    async def flash(self, restart=True) -> bool:
+        """Flash the project on the microbit, return True if flashed."""
+        await self.cmd("flash", (restart,))
+        return self.backend.flashed
+
+    async def sync(self):
+        """Show the sync image on the microbit screen."""
+        await self.cmd("_sync")
+
+    async def exec(self, command):
+        """Exec some code on the microbit and get result."""
+        return await self.cmd("exec", (command,))
+
+    async def listdir(self) -> list:
+        """Get files list of the microbit."""
+        return await self.cmd("listdir")
+
+    async def get(self, src, dest=None):
+        """Get a file from the microbit."""
+        await self.cmd("get", (src, dest))
+
+    async def put(self, src):
+        """Put a computer file in the microbit."""
+        await self.cmd("put", (src,))
+
+    def get_progress(self, src, dest=None, chunk_size=1024):
+        """Get a file from the microbit, async iterator of (written, size)."""
+        return self._progress("get", (src, dest, chunk_size))
+
+    def put_progress(self, src, chunk_size=256):
+        """Put a computer file in the microbit, async iterator of (written, size)."""
+        return self._progress("put", (src, chunk_size))
+
+    async def _progress(self, cmd, cmd_data):
+        """Execute a cmd with a progress callback and yield his progress."""
+        loop = asyncio.get_running_loop()
+        progress = asyncio.Queue()
+
+        def progress_callback(written, size):
+            loop.call_soon_threadsafe(progress.put_nowait, (written, size))
+
+        future = asyncio.wrap_future(
+            self.backend.submit(cmd, (*cmd_data, progress_callback))
+        )
+        # progress items are queued before the result, None mark the end
+        future.add_done_callback(lambda _: progress.put_nowait(None))
+        while True:
+            item = await progress.get()
+            if item is None:
+                break
+            yield item
+        await future # raise exec errors
+
+    async def exit(self):
+        """Quit the backend."""
+        await asyncio.get_running_loop().run_in_executor(None, self.backend.exit)
+
+
 # cli interface
 class Cli_Backend():
 
@@ -439,6 +1382,7 @@ class Cli_Backend():
             console_log=True,
             logfile_path=os.path.join(PATH_DATA, "cli_backend.log"),
             loglevel=loglevel,
+            stats_path=os.path.join(PATH_DATA, "cli_backend_stats.jsonl"),
         )
         # start cli
         self.start()
@@ -467,8 +1411,11 @@ class Cli_Backend():
                     cmd_data = adds_args
                     cmd = args[0]
 
-                # exec and get retrn of cmd 
-                retrn = self.backend.send_cmd(cmd, cmd_data)
+                # exec and get retrn of cmd (the error is already logged by the backend)
+                try:
+                    retrn = self.backend.send_cmd(cmd, cmd_data)
+                except Exception:
+                    continue
                 if retrn != None: print(retrn)
 
 
@@ -0,0 +1,220 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - TOOL BUNDLE ---
+
+# imports
+import os
+import ast
+import copy
+import shutil
+import tempfile
+from threading import Lock
+
+
+# constants
+PATH_SRC = os.path.dirname(os.path.dirname(__file__)) # sources/
+PATH_DATA = os.path.join(os.path.dirname(PATH_SRC), "data") # data/
+PATH_BUNDLE = os.path.join(PATH_DATA, "bundle") # data/bundle/
+BUNDLE_MAIN_FILE = "main.py" # entry point, nothing import it
+BUNDLE_MERGED_MODULES = [] # modules merged in main.py (optional, ex: ["data_lib", "lib_neopix"])
+
+
+# ast helpers
+def _bound_names(tree:ast.AST) -> dict:
+    """Count how many times each name is bound (assigned, declared, imported...) in a tree."""
+    bound = {}
+    def bind(name):
+        bound[name] = bound.get(name, 0) + 1
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            bind(node.id)
+        elif isinstance(node, ast.arg):
+            bind(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bind(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            for name in node.names: bind(name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names: bind((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bind(node.name)
+    return bound
+
+def _top_level_names(tree:ast.Module) -> set:
+    """Get the names defined at the top level of a module (except imports)."""
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif not isinstance(node, (ast.Import, ast.ImportFrom)):
+            for sub_node in ast.walk(node):
+                if isinstance(sub_node, ast.Name) and isinstance(sub_node.ctx, ast.Store):
+                    names.add(sub_node.id)
+    return names
+
+def _constant_value(node:ast.AST):
+    """Get the literal of a constant value (also micropython const(...)), else None."""
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id == "const" and len(node.args) == 1 and not node.keywords):
+        node = node.args[0]
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool)):
+        return node
+    return None
+
+
+# transformations
+class _DocstringRemover(ast.NodeTransformer):
+    """Remove the docstrings of the module, classes and functions (and annotations)."""
+    def _remove_docstring(self, node):
+        self.generic_visit(node)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            node.returns = None
+            for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
+                arg.annotation = None
+        if (node.body and isinstance(node.body[0], ast.Expr)
+                and isinstance(node.body[0].value, ast.Constant)
+                and isinstance(node.body[0].value.value, str)):
+            node.body = node.body[1:] or [ast.Pass()]
+        return node
+
+    visit_Module = _remove_docstring
+    visit_ClassDef = _remove_docstring
+    visit_FunctionDef = _remove_docstring
+    visit_AsyncFunctionDef = _remove_docstring
+
+class _ConstantInliner(ast.NodeTransformer):
+    """Replace the reading of module constants by their value."""
+    def __init__(self, constants:dict):
+        self.constants = constants
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            return ast.copy_location(copy.copy(self.constants[node.id]), node)
+        return node
+
+class _ModuleInliner(ast.NodeTransformer):
+    """Replace the imports of merged modules (and their attributes) in a module."""
+    def __init__(self, modules:list):
+        self.modules = modules
+        self.aliases = set(modules)
+
+    def visit_Import(self, node):
+        names = []
+        for alias in node.names:
+            if alias.name in self.modules:
+                self.aliases.add(alias.asname or alias.name)
+            else:
+                names.append(alias)
+        if not names:
+            return ast.copy_location(ast.Pass(), node)
+        node.names = names
+        return node
+
+    def visit_ImportFrom(self, node):
+        if node.module not in self.modules:
+            return node
+        # the names are already defined, only the renamed ones are assigned
+        nodes = [
+            ast.Assign(targets=[ast.Name(id=alias.asname, ctx=ast.Store())], value=ast.Name(id=alias.name, ctx=ast.Load()))
+            for alias in node.names if alias.asname and alias.asname != alias.name
+        ]
+        return [ast.copy_location(new_node, node) for new_node in nodes] or ast.copy_location(ast.Pass(), node)
+
+    def visit_Attribute(self, node):
+        self.generic_visit(node)
+        if isinstance(node.value, ast.Name) and node.value.id in self.aliases:
+            return ast.copy_location(ast.Name(id=node.attr, ctx=node.ctx), node)
+        return node
+
+
+# bundle
+def minify_source(data:bytes, is_main:bool=False) -> bytes:
+    """
+    Minify a python module: comments and docstrings stripped, module constants
+    inlined (their assignment is kept if the module can be imported).
+    """
+    tree = ast.parse(data)
+    tree = _DocstringRemover().visit(tree)
+    # module constants: literal assigned only once at the top level
+    bound_names = _bound_names(tree)
+    constants, constants_assign = {}, []
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and bound_names.get(node.targets[0].id) == 1):
+            value = _constant_value(node.value)
+            if value is not None:
+                constants[node.targets[0].id] = value
+                constants_assign.append(node)
+    if is_main:
+        tree.body = [node for node in tree.body if node not in constants_assign] or [ast.Pass()]
+    tree = _ConstantInliner(constants).visit(tree)
+    return (ast.unparse(ast.fix_missing_locations(tree)) + "\n").encode("utf-8")
+
+def merge_modules(main_data:bytes, modules:dict) -> bytes:
+    """
+    Merge modules (dict of name: data) at the beginning of the main module and
+    remove their imports. Raise ValueError if a module redefine a main name.
+    """
+    main_tree = ast.parse(main_data)
+    names = _top_level_names(main_tree)
+    merged_body = []
+    for module, data in modules.items():
+        tree = ast.parse(data)
+        collisions = names & _top_level_names(tree)
+        if collisions:
+            raise ValueError(f"can't merge '{module}', names already defined: {', '.join(sorted(collisions))}")
+        names |= _top_level_names(tree)
+        merged_body.extend(_ModuleInliner(list(modules)).visit(tree).body)
+    main_tree = _ModuleInliner(list(modules)).visit(main_tree)
+    main_tree.body = merged_body + main_tree.body
+    return ast.unparse(ast.fix_missing_locations(main_tree)).encode("utf-8")
+
+def build_bundle(files:list, merged_modules:list=BUNDLE_MERGED_MODULES) -> list:
+    """
+    Build the deployment bundle of files (list of (name, data)): python modules
+    minified and optionally merged in main.py, other files unchanged.
+    Raise ValueError if a module can't be merged or a file is not valid python.
+    """
+    files = dict(files)
+    # merge modules in main (removed from the bundle)
+    modules = {module: files.pop(f"{module}.py") for module in merged_modules if f"{module}.py" in files}
+    if modules and BUNDLE_MAIN_FILE in files:
+        files[BUNDLE_MAIN_FILE] = merge_modules(files[BUNDLE_MAIN_FILE], modules)
+    bundle_files = []
+    for name, data in files.items():
+        if name.endswith(".py"):
+            try:
+                data = minify_source(data, is_main=name == BUNDLE_MAIN_FILE)
+            except SyntaxError as err:
+                raise ValueError(f"'{name}' is not a valid python file ({err})") from err
+        bundle_files.append((name, data))
+    return bundle_files
+
+def bundle_report(files:list, bundle_files:list) -> list:
+    """Get (name, source size, bundle size) of each file of the bundle (and merged modules)."""
+    bundle_sizes = dict((name, len(data)) for name, data in bundle_files)
+    return [(name, len(data), bundle_sizes.get(name)) for name, data in files]
+
+_save_lock = Lock() # the bundle directory is shared by all backends (fleet flashes in parallel)
+
+def save_bundle(bundle_files:list, path:str=PATH_BUNDLE):
+    """Save the bundle files in a directory (replaced, written in a temporary directory first)."""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix=".bundle_", dir=parent)
+    try:
+        for name, data in bundle_files:
+            with open(os.path.join(temp_path, name), "wb") as f_bundle:
+                f_bundle.write(data)
+        with _save_lock:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(temp_path, path)
+    except:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
@@ -0,0 +1,285 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - TOOL FIRMWARE ---
+
+# imports
+import os
+import shutil
+import filecmp
+import struct
+import hashlib
+import importlib
+from threading import Lock
+
+import uflash
+
+
+# constants
+MICROPYTHON_RUNTIME = uflash._RUNTIME # micropython firmware runtime (v1 and v2)
+PATH_SRC = os.path.dirname(os.path.dirname(__file__)) # sources/
+PATH_DATA = os.path.join(os.path.dirname(PATH_SRC), "data") # data/
+PATH_SRC_MAIN_MICROBIT = os.path.join(PATH_SRC, "MicroTamagotchi") # sources/MicroTamagotchi/
+PATH_DATA_MAIN_MICROBIT = os.path.join(PATH_DATA, "microbit_data") # data/microbit_data/
+PATH_HEX_CACHE = os.path.join(PATH_DATA, "hex_cache") # data/hex_cache/
+PATH_FIRMWARE = os.path.join(PATH_DATA, "micropython.hex") # data/micropython.hex
+HEX_CACHE_MAX_ENTRIES = 5 # last built hex kept in the cache (about 2 MB each)
+FS_BOUNDS = { # filesystem (start, end) addresses by microbit version id
+    uflash._MICROBIT_ID_V1: (uflash._FS_START_ADDR_V1, uflash._FS_END_ADDR_V1),
+    uflash._MICROBIT_ID_V2: (uflash._FS_START_ADDR_V2, uflash._FS_END_ADDR_V2),
+}
+FS_CHUNK_SIZE = 128 # chunks of the micropython filesystem
+FS_CHUNK_DATA_SIZE = 126 # 1st & last bytes are the prev/next chunk pointers
+FS_MAX_CHUNKS = 252 # chunk indexes are bytes (0x00, 0xFE, 0xFF are markers)
+FS_VERSION_NAMES = { # microbit version name by id (for messages)
+    uflash._MICROBIT_ID_V1: "v1",
+    uflash._MICROBIT_ID_V2: "v2",
+}
+MPY_CROSS_MODULES = { # mpy-cross package (optional) by microbit fs version
+    2.0: "mpy_cross_v5", # micropython v2 for microbit (based on micropython 1.15 to 1.18)
+}
+MPY_VERSIONS_ID = { # microbit fs version of each universal hex section
+    uflash._MICROBIT_ID_V2: 2.0,
+}
+MPY_SOURCE_FILES = ["main.py"] # executed as source at the boot, never precompiled
+
+
+# project files
+def project_files() -> list:
+    """Get (name, data) of each file to put in the microbit filesystem."""
+    files = []
+    for base_path in [PATH_SRC_MAIN_MICROBIT, PATH_DATA_MAIN_MICROBIT]:
+        for file_or_dir in sorted(os.listdir(base_path)):
+            path = os.path.join(base_path, file_or_dir)
+            if os.path.isfile(path):
+                with open(path, "rb") as f_src:
+                    files.append((file_or_dir, f_src.read()))
+    return files
+
+
+# precompilation
+def compile_mpy(name:str, data:bytes, version:float):
+    """
+    Cross-compile a python module to .mpy bytecode for a microbit fs version,
+    return None if no compiler is available or if the compilation failed.
+    """
+    if version not in MPY_CROSS_MODULES:
+        return None
+    try:
+        mpy_cross = importlib.import_module(MPY_CROSS_MODULES[version])
+    except ImportError:
+        return None
+    try:
+        _, mpy_data = mpy_cross.mpy_cross_compile(name, data.decode("utf-8"))
+    except (OSError, UnicodeDecodeError):
+        return None
+    return mpy_data
+
+def mpy_cross_available(version:float) -> bool:
+    """Check if the mpy-cross package of a microbit fs version is installed."""
+    if version not in MPY_CROSS_MODULES:
+        return False
+    try:
+        importlib.import_module(MPY_CROSS_MODULES[version])
+    except ImportError:
+        return False
+    return True
+
+def precompile_files(files:list, version:float) -> list:
+    """
+    Replace the python modules of files (list of (name, data)) by their .mpy
+    bytecode for a microbit fs version, keep the source if not compiled.
+    """
+    compiled_files = []
+    for name, data in files:
+        if name.endswith(".py") and name not in MPY_SOURCE_FILES:
+            mpy_data = compile_mpy(name, data, version)
+            if mpy_data is not None:
+                compiled_files.append((name[:-3] + ".mpy", mpy_data))
+                continue
+        compiled_files.append((name, data))
+    return compiled_files
+
+def precompiled_modules(files:list) -> list:
+    """Get the module names of the .mpy files in files (list of (name, data))."""
+    return [name[:-4] for name, _ in files if name.endswith(".mpy")]
+
+
+# filesystem image
+def _fs_content(name:str, data:bytes) -> bytes:
+    """Get the content of a file in the filesystem (line endings converted, header and name before the data)."""
+    # convert line endings in case the file was created on Windows (not for bytecode)
+    if not name.endswith(".mpy"):
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    name = name.encode("utf-8")
+    # file start chunk: 0xFE, end offset (set after), name length, name, data
+    return struct.pack("BB", 0, len(name)) + name + data
+
+def fs_max_chunks(microbit_version_id:str) -> int:
+    """Get the number of chunks of the filesystem of a microbit version."""
+    if microbit_version_id not in FS_BOUNDS:
+        raise ValueError(f"Incompatible micro:bit ID found: {microbit_version_id}")
+    fs_start_address, fs_end_address = FS_BOUNDS[microbit_version_id]
+    return min((fs_end_address - fs_start_address) // FS_CHUNK_SIZE, FS_MAX_CHUNKS)
+
+def check_fs_size(files:list, microbit_version_id:str) -> None:
+    """Raise ValueError if files (list of (name, data)) don't fit in the filesystem of a microbit version."""
+    nb_max_chunks = fs_max_chunks(microbit_version_id)
+    size, nb_chunks = 0, 0
+    for name, data in files:
+        content_size = len(_fs_content(name, data))
+        size += content_size
+        # chunks of the file, and an empty chunk at the end if the last is full
+        nb_chunks += content_size // FS_CHUNK_DATA_SIZE + 1
+    if nb_chunks > nb_max_chunks:
+        raise ValueError(
+            f"{size} bytes > {nb_max_chunks * FS_CHUNK_DATA_SIZE} bytes capacity of the micro:bit "
+            f"{FS_VERSION_NAMES.get(microbit_version_id, microbit_version_id)} filesystem "
+            f"({nb_chunks} chunks > {nb_max_chunks})"
+        )
+
+def files_to_fs(files:list, microbit_version_id:str) -> str:
+    """
+    Encode files in the micropython filesystem of a microbit version, return
+    Intel Hex records (like uflash.script_to_fs, but for many files).
+    """
+    # find fs boundaries based on micro:bit version ID, check the size before build the chunks
+    check_fs_size(files, microbit_version_id)
+    fs_start_address, fs_end_address = FS_BOUNDS[microbit_version_id]
+    universal_data_record = microbit_version_id == uflash._MICROBIT_ID_V2
+
+    chunks = []
+    for name, data in files:
+        content = _fs_content(name, data)
+        first_chunk = len(chunks)
+        for i in range(0, len(content), FS_CHUNK_DATA_SIZE):
+            chunk_index = len(chunks) + 1
+            if i == 0:
+                chunk = bytearray(b"\xFE")
+            else:
+                # the previous chunk tail points to this one, and head to previous
+                chunks[-1][-1] = chunk_index
+                chunk = bytearray(struct.pack("B", chunk_index - 1))
+            chunk += content[i:i + FS_CHUNK_DATA_SIZE]
+            chunks.append(chunk + b"\xFF" * (FS_CHUNK_SIZE - len(chunk)))
+        # end of file offset in the last chunk (0: need an empty chunk at the end)
+        end_offset = len(content) % FS_CHUNK_DATA_SIZE
+        chunks[first_chunk][1] = end_offset
+        if end_offset == 0:
+            chunks[-1][-1] = len(chunks) + 1
+            chunks.append(bytearray(struct.pack("B", len(chunks)) + b"\xFF" * (FS_CHUNK_SIZE - 1)))
+
+    if not chunks:
+        return ""
+    fs_ihex = uflash.bytes_to_ihex(fs_start_address, b"".join(chunks), universal_data_record)
+    # add this byte after the fs flash area to configure the scratch page there
+    scratch_ihex = uflash.bytes_to_ihex(fs_end_address, b"\xfd", universal_data_record)
+    # remove scratch Extended Linear Address record if we are in the same range
+    ela_record_len = 16
+    if fs_ihex[:ela_record_len] == scratch_ihex[:ela_record_len]:
+        scratch_ihex = scratch_ihex[ela_record_len:]
+    return fs_ihex + "\n" + scratch_ihex + "\n"
+
+def embed_files_uhex(universal_hex_str:str, files:list, section_files:dict=None) -> str:
+    """
+    Embed files in the filesystem of each section (v1 and v2) of a micropython
+    universal hex (like uflash.embed_fs_uhex, but for many files), section_files
+    replace files for some microbit version ids (like precompiled files).
+    """
+    section_files = section_files or {}
+    if not files and not any(section_files.values()):
+        return universal_hex_str
+    # separate the universal hex sections (v1 and v2)
+    section_start = ":020000040000FA\n:0400000A"
+    second_section_i = universal_hex_str[len(section_start):].find(
+        section_start
+    ) + len(section_start)
+    uhex_sections = [
+        universal_hex_str[:second_section_i],
+        universal_hex_str[second_section_i:],
+    ]
+
+    # add the files to the filesystem of each section
+    full_uhex_with_fs = ""
+    for section in uhex_sections:
+        # device ID follow the Block Start record
+        block_start_record_start = ":0400000A"
+        device_id_i = section.find(block_start_record_start) + len(block_start_record_start)
+        device_id = section[device_id_i:device_id_i + 4]
+        fs_hex = uflash.pad_hex_string(files_to_fs(section_files.get(device_id, files), device_id))
+        # the fs is placed right before the UICR records (compatible with all DAPLink)
+        uicr_i = section.rfind(":020000041000EA")
+        ela_record = ":020000040000FA\n"
+        if section[:uicr_i].endswith(ela_record):
+            uicr_i -= len(ela_record)
+        esa_record = ":020000020000FC\n"
+        if section[:uicr_i].endswith(esa_record):
+            uicr_i -= len(esa_record)
+        full_uhex_with_fs += section[:uicr_i] + fs_hex + section[uicr_i:]
+    return full_uhex_with_fs
+
+
+# hex cache
+_lock_hex_cache = Lock()
+
+def build_hex(files:list, runtime:str=MICROPYTHON_RUNTIME, section_files:dict=None) -> str:
+    """
+    Build a firmware hex with the runtime and files (list of (name, data)),
+    return his path in the hex cache. Raise ValueError if files are too large.
+    """
+    section_files = section_files or {}
+    runtime_hash = hashlib.sha256(runtime.encode("ascii")).hexdigest()[:16]
+    files_hash = hashlib.sha256()
+    for version_id, version_files in [(None, files)] + sorted(section_files.items()):
+        if version_id is not None:
+            files_hash.update(version_id.encode("ascii"))
+        for name, data in version_files:
+            files_hash.update(struct.pack("<II", len(name), len(data)) + name.encode("utf-8") + data)
+    hex_path = os.path.join(PATH_HEX_CACHE, f"{runtime_hash}_{files_hash.hexdigest()[:16]}.hex")
+    with _lock_hex_cache:
+        # build only if not already in the cache (else mark it as recently used)
+        if not os.path.exists(hex_path):
+            os.makedirs(PATH_HEX_CACHE, exist_ok=True)
+            hex_code = embed_files_uhex(runtime, files, section_files)
+            temp_path = hex_path + ".tmp"
+            with open(temp_path, "wb") as output:
+                output.write(hex_code.encode("ascii"))
+            os.replace(temp_path, hex_path)
+        else:
+            os.utime(hex_path)
+        _prune_hex_cache(hex_path)
+        # keep a copy of the last firmware in 'data' (for flash it manually), compared by content
+        if not os.path.exists(PATH_FIRMWARE) or not filecmp.cmp(PATH_FIRMWARE, hex_path, shallow=False):
+            shutil.copyfile(hex_path, PATH_FIRMWARE)
+    return hex_path
+
+def _prune_hex_cache(keep_path:str) -> None:
+    """Remove the least recently used hex of the cache, keep HEX_CACHE_MAX_ENTRIES (and keep_path)."""
+    entries = [
+        os.path.join(PATH_HEX_CACHE, name) for name in os.listdir(PATH_HEX_CACHE)
+        if name.endswith(".hex")
+    ]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[HEX_CACHE_MAX_ENTRIES:]:
+        if path != keep_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def build_precompiled_hex(files:list, runtime:str=MICROPYTHON_RUNTIME) -> tuple:
+    """
+    Build a firmware hex with the files precompiled for each microbit version
+    that support it (the others get the source), return (hex path, precompiled
+    module names). Raise ValueError if files are too large.
+    """
+    section_files, modules = {}, []
+    for version_id, version in MPY_VERSIONS_ID.items():
+        compiled_files = precompile_files(files, version)
+        if precompiled_modules(compiled_files):
+            section_files[version_id] = compiled_files
+            modules = sorted(set(modules) | set(precompiled_modules(compiled_files)))
+    return build_hex(files, runtime, section_files), modules
@@ -0,0 +1,310 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - TOOL LIBRARY ---
+
+# imports
+import os
+import json
+from backend import character_file, import_microbit_module
+
+data_lib = import_microbit_module("data_lib")
+
+
+# constants
+LIBRARY_FORMAT = "microtamagotchi-library"
+LIBRARY_VERSION = 1
+LIBRARY_EXT = ".jsonl" # JSON Lines: a header line, then a line by character
+CONF_UUID = "ba1f4ccc-efc6-4766-8111-30408e2feb5d" # created with https://www.uuidgenerator.net/
+MERGE_POLICIES = ["keep", "replace", "rename"] # for the characters with the same name
+MAX_DELTA_CHAIN = 8 # max frames decoded in a row for get a delta frame on the microbit
+
+
+class LibraryError(ValueError):
+
+    """
+    A character library is not valid (the file and the line are in the message).
+    """
+
+    pass
+
+
+# validation
+def validate_frame(frame) -> list:
+    """Check a frame ([pixels, [width, height]], or his repr in old files), return it with lists."""
+    if isinstance(frame, str):
+        frame = data_lib.loads(frame)
+    if not isinstance(frame, (list, tuple)) or len(frame) != 2:
+        raise ValueError("a frame must be [pixels, [width, height]]")
+    pixels, size = frame
+    if (not isinstance(size, (list, tuple)) or len(size) != 2
+        or any(type(n) is not int or not 1 <= n <= 5 for n in size)):
+        raise ValueError(f"invalid frame size: {size!r}")
+    if not isinstance(pixels, (list, tuple)) or len(pixels) != size[0] * size[1]:
+        raise ValueError(f"a frame of size {size[0]}x{size[1]} must have {size[0] * size[1]} pixels")
+    if any(type(pix) is not int or not -1 <= pix <= 9 for pix in pixels):
+        raise ValueError("the pixels must be integers from -1 (disabled) to 9")
+    return [list(pixels), list(size)]
+
+def validate_character(name, character) -> dict:
+    """Check a character ({"delay": ms, "data": frames}), return it with lists."""
+    if not isinstance(name, str):
+        raise ValueError(f"invalid character name: {name!r}")
+    character_file(name) # raise if the name can't be a file
+    if not isinstance(character, dict):
+        raise ValueError(f"character '{name}' must be a dict")
+    delay = character.get("delay")
+    if type(delay) is not int or delay <= 0:
+        raise ValueError(f"invalid delay of character '{name}': {delay!r}")
+    frames = character.get("data")
+    if not isinstance(frames, (list, tuple)) or not frames:
+        raise ValueError(f"character '{name}' has no frames")
+    return {"delay": delay, "data": [validate_frame(frame) for frame in frames]}
+
+
+# compact characters (for the microbit)
+def _encode_rle(pixels:list) -> str:
+    """Run-length code of pixels ("r" + count letter, digit)."""
+    code = "r"
+    indx = 0
+    while indx < len(pixels):
+        count = 1
+        while indx + count < len(pixels) and pixels[indx + count] == pixels[indx]:
+            count += 1
+        code += chr(96 + count) + chr(48 + pixels[indx])
+        indx += count
+    return code
+
+def _encode_delta(pixels:list, prev:list) -> str:
+    """Delta code of pixels from the previous frame ("d" + index letter, digit)."""
+    return "d" + "".join(chr(97 + indx) + chr(48 + pix) for indx, pix in enumerate(pixels) if pix != prev[indx])
+
+def compact_character(character:dict, rle=True, delta=True) -> dict:
+    """
+    Convert a character to the compact format read by data_lib.Frames: the
+    identical frames are stored once and referenced by index in "seq", the
+    pixels are a text of a char by pixel (a 4 bits value: "/" for the
+    disabled leds, else the digit of the brightness), or the shortest
+    of the run-length and delta from the previous frame codes if allowed.
+    """
+    frames, seq, indexes = [], [], {}
+    prev, prev_size, chain = None, None, 0
+    for pixels, size in validate_character("character", character)["data"]:
+        key = (tuple(size), tuple(pixels))
+        if key not in indexes:
+            code = "".join(chr(48 + pix) for pix in pixels)
+            if rle:
+                code = min(code, _encode_rle(pixels), key=len)
+            if delta and prev_size == size and chain < MAX_DELTA_CHAIN:
+                code = min(code, _encode_delta(pixels, prev), key=len)
+            chain = chain + 1 if code[0] == "d" else 0
+            indexes[key] = len(frames)
+            frames.append([size[0], size[1], code])
+            prev, prev_size = pixels, size
+        seq.append(indexes[key])
+    return {"delay": character["delay"], "seq": seq, "frames": frames}
+
+def expand_character(character:dict) -> dict:
+    """Convert a character of the microbit (compact or not) to a character with a list of [pixels, size]."""
+    frames = data_lib.Frames(character)
+    return {"delay": character["delay"], "data": [[list(frames[indx][0]), list(frames[indx][1])] for indx in range(len(frames))]}
+
+
+# read / write
+class LibraryReader:
+
+    """
+    Read a character library one character at a time (the settings of the
+    header are read at the opening): iterate on it for get each (name,
+    character) validated. The old .json configurations (a single JSON
+    object) are also read, but loaded in one time.
+    """
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._f_read = open(path, "rb")
+        self._line = 1
+        self._legacy_images = None
+        try:
+            header = self._loads(self._f_read.readline())
+        except LibraryError:
+            header = None
+        try:
+            if isinstance(header, dict) and header.get("format") == LIBRARY_FORMAT:
+                if header.get("version", 0) > LIBRARY_VERSION:
+                    raise LibraryError(f"{path}: library version {header['version']} is not supported")
+            else:
+                # old configuration file
+                self._f_read.seek(0)
+                header = self._loads(self._f_read.read())
+                if not isinstance(header, dict) or header.get("uuid") != CONF_UUID:
+                    raise LibraryError(f"{path}: not a MicroTamagotchi library")
+                self._legacy_images = header.get("images", {})
+            self.settings = header.get("settings")
+            if not isinstance(self.settings, dict):
+                raise LibraryError(f"{path}: no settings in the library")
+        except:
+            self.close()
+            raise
+
+    @property
+    def position(self) -> int:
+        """Bytes of the file already read."""
+        return self.size if self._legacy_images is not None else self._f_read.tell()
+
+    def _loads(self, line:bytes):
+        """Load a JSON line (LibraryError if not valid)."""
+        try:
+            return json.loads(line)
+        except ValueError as err:
+            raise LibraryError(f"{self.path}:{self._line}: {err}") from None
+
+    def __iter__(self):
+        if self._legacy_images is not None:
+            for name, character in self._legacy_images.items():
+                try:
+                    yield name, validate_character(name, character)
+                except Exception as err:
+                    raise LibraryError(f"{self.path}: {err}") from None
+            return
+        for line in iter(self._f_read.readline, b""):
+            self._line += 1
+            if not line.strip():
+                continue
+            entry = self._loads(line)
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError("a line must be a character")
+                name = entry.get("name")
+                yield name, validate_character(name, entry)
+            except ValueError as err:
+                raise LibraryError(f"{self.path}:{self._line}: {err}") from None
+
+    def close(self) -> None:
+        self._f_read.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LibraryWriter:
+
+    """
+    Write a character library one character at a time, in a temporary file
+    who replace the library at the close (removed if an error is raised in
+    the with block).
+    """
+
+    def __init__(self, path:str, settings:dict) -> None:
+        self.path = path
+        self.names = [] # characters written
+        self._names = set()
+        self._temp_path = path + ".tmp"
+        self._f_write = open(self._temp_path, "w", encoding="utf-8", newline="\n")
+        self._write_line({
+            "format": LIBRARY_FORMAT,
+            "version": LIBRARY_VERSION,
+            "uuid": CONF_UUID, # unique id for recognize microtamagotchi_confs
+            "settings": settings
+        })
+
+    def _write_line(self, data:dict) -> None:
+        self._f_write.write(json.dumps(data, separators=(",", ":")) + "\n")
+
+    def write(self, name:str, character:dict) -> None:
+        """Validate and write a character."""
+        if name in self._names:
+            raise LibraryError(f"character '{name}' is already in the library")
+        character = validate_character(name, character)
+        self._write_line({"name": name, "delay": character["delay"], "data": character["data"]})
+        self.names.append(name)
+        self._names.add(name)
+
+    def close(self, save=True) -> None:
+        """Close the library (replace the file if save, else discard it)."""
+        self._f_write.close()
+        if save:
+            os.replace(self._temp_path, self.path)
+        elif os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(save=exc_type is None)
+
+
+# merge
+def plan_names(entries:list, policy="keep") -> list:
+    """
+    Plan the name of each character of merged sources (entries: list of
+    (source indx, name) in the order of the sources). For the characters with
+    the same name: keep the first, replace by the last or rename it (name_2,
+    ...). Return a name by entry (None if the character is skipped).
+    """
+    assert policy in MERGE_POLICIES, f"policy must be in {MERGE_POLICIES}"
+    last_source = {name: indx for indx, name in entries}
+    plan, names = [], {}
+    for indx, name in entries:
+        if name in names or (policy == "replace" and last_source[name] != indx):
+            if policy != "rename":
+                plan.append(None) # skipped
+                continue
+            nb = 2
+            while f"{name}_{nb}" in names or f"{name}_{nb}" in last_source:
+                nb += 1
+            name = f"{name}_{nb}"
+        plan.append(name)
+        names[name] = True
+    return plan
+
+def merge_libraries(paths:list, dest:str, policy="keep", progress=None) -> dict:
+    """
+    Merge libraries in dest, one character at a time. For the characters with
+    the same name: keep the first, replace by the last or rename it (name_2,
+    ...). The settings are those of the first library, with all the
+    characters. progress(done, total, name) is called for each character (in
+    bytes read by the 2 passes). Return the settings of dest.
+    """
+    assert policy in MERGE_POLICIES, f"policy must be in {MERGE_POLICIES}"
+    sizes = [os.path.getsize(path) for path in paths]
+    total = sum(sizes) * 2
+
+    # first pass: check the libraries and plan the name of each character (names only in memory)
+    entries = [] # (library indx, name) in the order of the files
+    for indx, path in enumerate(paths):
+        with LibraryReader(path) as reader:
+            if indx == 0:
+                settings = dict(reader.settings)
+            for name, _ in reader:
+                if progress is not None:
+                    progress(sum(sizes[:indx]) + reader.position, total, name)
+                entries.append((indx, name))
+    plan = plan_names(entries, policy)
+    names = [name for name in plan if name is not None]
+
+    # settings with all the characters
+    settings["characters_list"] = names
+    if settings.get("character") not in names and names:
+        settings["character"] = settings["characters_list"][0]
+
+    # second pass: write the characters
+    plan = iter(plan)
+    with LibraryWriter(dest, settings) as writer:
+        for indx, path in enumerate(paths):
+            with LibraryReader(path) as reader:
+                for _, character in reader:
+                    name = next(plan)
+                    if progress is not None:
+                        progress(sum(sizes) + sum(sizes[:indx]) + reader.position, total, name or "")
+                    if name is not None:
+                        writer.write(name, character)
+    return settings
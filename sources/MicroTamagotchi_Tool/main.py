@@ -10,15 +10,19 @@
 import os
 import sys
 import json
-import time
-from backend import MicroBit_Backend
+import math
+import queue
+from backend import MicroBit_Backend, character_file, import_microbit_module
+from pyboard import PyboardError
+import library
 
-from PIL import Image, ImageDraw, ImageTk
+from PIL import Image, ImageColor, ImageTk
 import tkinter as tk
 from tkinter import filedialog # python >= 3.9
 import customtkinter as ctk
 from CTkMessagebox import CTkMessagebox
-from threading import Thread
+from threading import Event
+from concurrent.futures import ThreadPoolExecutor
 
 
 
@@ -31,6 +35,19 @@ PATH_ICON_APP = os.path.join(PATH_PRJ, "data", "icon.ico") # data/icon.ico
 PATH_ICON_DELETE = os.path.join(PATH_PRJ, "data", "delete.ico") # data/delete.ico
 PATH_SETTINGS = os.path.join(PATH_PRJ, "data", "microtamagotchi_settings.json") # data/settings.json
 PATH_TEMP = os.path.join(PATH_PRJ, "data", "temp") # data/temp/
+PROGRESS_UPDATE_MS = 100 # interval between updates of the transfer progress
+THUMBNAIL_CACHE_SIZE = 256 # miniatures of frames kept in memory
+PREVIEW_IDLE_MS = 500 # interval between checks of the preview without frames
+JOBS_POLL_MS = 50 # interval between runs of the calls sent to the Tk thread
+JOBS_MAX_CALLS = 100 # max calls run by poll (keep the window repainting)
+IMPORT_BATCH_BYTES = 4096 # max characters data uploaded by transaction (the journal is loaded in the microbit RAM)
+COMPACT_RLE = True # characters uploaded with run-length frames (if shorter)
+COMPACT_DELTA = True # characters uploaded with delta from the previous frame (if shorter)
+LIBRARY_FILETYPES = [('library', '*' + library.LIBRARY_EXT), ('old configuration', '*.json')]
+
+
+# microbit modules (also run on the computer)
+data_lib = import_microbit_module("data_lib") # .mtd parser
 
 
 # tempfiles
@@ -38,6 +55,138 @@ def temp_path(filename:str) -> str:
     return os.path.join(PATH_TEMP, filename) # data/temp/[filename]
 
 
+# transfer progress
+def format_progress(phase, name, done, total, speed, eta) -> str:
+    """Format a transfer progress (phase, name, bytes done/total, bytes/sec, eta)."""
+    txt = f"{phase} {name} : {done / 1024:.1f}/{total / 1024:.1f} KB - {speed / 1024:.1f} KB/s"
+    if eta is not None and done < total:
+        txt += f" - {eta:.0f}s left"
+    return txt
+
+
+# background jobs
+class JobCancelled(Exception):
+
+    """
+    A background job was cancelled.
+    """
+
+    pass
+
+
+class GuiJob:
+
+    """A background job (progress and cancel are thread-safe)."""
+
+    def __init__(self, jobs, name:str) -> None:
+        self.jobs = jobs
+        self.name = name
+        self._cancel = Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def cancel(self) -> None:
+        """Ask the job to stop (at his next check)."""
+        self._cancel.set()
+
+    def check(self) -> None:
+        """Raise JobCancelled if the job was cancelled (called by the job between steps)."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def progress(self, done:int, total:int, text="") -> None:
+        """Show the progress of the job (from the worker thread)."""
+        self.check()
+        self.jobs.call_in_tk(self.jobs._show, self, done, total, text)
+
+
+class GuiJobs:
+
+    """
+    Background jobs of the GUI: the blocking functions (serial transfers
+    with the backend, files...) run one after the other in a worker thread,
+    their results and all the calls to the widgets are sent to the Tk
+    thread, run by a root.after loop.
+    """
+
+    def __init__(self, root, show_job=None, log=None) -> None:
+        self.root = root
+        self.show_job = show_job # show_job(job or None, done, total, text) in the Tk thread
+        self.log = log
+        self.jobs = [] # waiting and running jobs
+        self._calls = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gui_job")
+        self.root.after(JOBS_POLL_MS, self._poll)
+
+    @property
+    def busy(self) -> bool:
+        return bool(self.jobs)
+
+    def call_in_tk(self, funct, *args) -> None:
+        """Call a function in the Tk thread (from any thread)."""
+        self._calls.put((funct, args))
+
+    def submit(self, name:str, funct, *args, on_done=None, on_error=None) -> GuiJob:
+        """
+        Run funct(job, *args) in the worker thread, then on_done(result) or
+        on_error(err) in the Tk thread (nothing if the job was cancelled).
+        """
+        job = GuiJob(self, name)
+        self.jobs.append(job)
+        self._show(job, 0, 0, "waiting")
+        def run():
+            try:
+                job.check()
+                result = funct(job, *args)
+            except JobCancelled:
+                self.call_in_tk(self._finish, job, None, None, None)
+            except Exception as err:
+                self.call_in_tk(self._finish, job, on_error, None, err)
+            else:
+                self.call_in_tk(self._finish, job, on_done, result, None)
+        self._executor.submit(run)
+        return job
+
+    def cancel_all(self) -> None:
+        """Cancel all waiting and running jobs."""
+        for job in self.jobs:
+            job.cancel()
+
+    def _show(self, job:GuiJob, done:int, total:int, text:str) -> None:
+        """Show a job progress (Tk thread)."""
+        if self.show_job is not None and job in self.jobs:
+            self.show_job(job, done, total, text)
+
+    def _finish(self, job:GuiJob, callback, result, err) -> None:
+        """End of a job (Tk thread)."""
+        self.jobs.remove(job)
+        if self.show_job is not None:
+            if self.jobs:
+                self.show_job(self.jobs[0], 0, 0, "")
+            else:
+                self.show_job(None, 0, 0, "cancelled" if job.cancelled else "")
+        if err is not None and self.log is not None:
+            self.log.error(f"job '{job.name}' failed ({type(err).__name__}: {err})")
+        if callback is not None and not job.cancelled:
+            callback(err if err is not None else result)
+
+    def _poll(self) -> None:
+        """Run the calls sent to the Tk thread."""
+        for _ in range(JOBS_MAX_CALLS):
+            try:
+                funct, args = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                funct(*args)
+            except Exception as err:
+                if self.log is not None:
+                    self.log.error(f"call of {getattr(funct, '__name__', funct)} in Tk failed ({type(err).__name__}: {err})")
+        self.root.after(JOBS_POLL_MS, self._poll)
+
+
 # widgets
 class CtkConnectStatus(ctk.CTkFrame):
 
@@ -152,8 +301,10 @@ class LED:
         self.update()
 
     def set(self, value:int) -> None:
-        self.value = max(-1, (min(9, value)))
-        self.uptodate = False
+        value = max(-1, (min(9, value)))
+        if value != self.value:
+            self.value = value
+            self.uptodate = False
 
     def update(self) -> None:
         if not self.uptodate:
@@ -166,6 +317,10 @@ class CtkLedMatrice(ctk.CTkFrame):
 
     """
     Led Matrice Widget for create matrices with a color for microbit screen.
+    Click (or drag) to paint leds, double click to disable a led (grey),
+    shift+click / ctrl+click to fill / clear a row. Keys (after a click):
+    0-9 set the brightness of the painted leds (and the led under the mouse),
+    up/down change it, f/c fill/clear the row under the mouse.
     """
 
     def __init__(self, master, **kwargs) -> None:
@@ -174,16 +329,28 @@ class CtkLedMatrice(ctk.CTkFrame):
         # vars
         self.height = self.width = 350
         self.led_size = self.height/5
-        self.led_select = None
+        self.led_select = None # led under the mouse
+        self.brightness = 9 # value of the painted leds
+        self._paint_value = None # value painted by the actual drag
+        self._last_value = None # value of the clicked led before the click
+        self._redraw_id = None # redraw scheduled (one by event loop tick)
         # create wisget
         self._setup_widgets()
         self._create_matrice()
         # tk binds
-        self.dclick_flag = False
-        self._create_canvas.bind("<Button-1>", self._on_click)
-        self._create_canvas.bind("<Double-1>", self._on_dclick)
-        self._create_canvas.bind("<MouseWheel>", self._on_scroll)
-        #NOTE: scroll function is not supported on linux
+        cv = self._create_canvas
+        cv.bind("<Button-1>", self._on_click)
+        cv.bind("<B1-Motion>", self._on_drag)
+        cv.bind("<ButtonRelease-1>", self._on_release)
+        cv.bind("<Double-1>", self._on_dclick)
+        cv.bind("<Shift-Button-1>", lambda event: self._on_row_click(event, self.brightness))
+        cv.bind("<Control-Button-1>", lambda event: self._on_row_click(event, 0))
+        cv.bind("<Motion>", self._on_motion)
+        cv.bind("<Leave>", self._on_leave)
+        cv.bind("<Key>", self._on_key)
+        cv.bind("<MouseWheel>", self._on_scroll)
+        cv.bind("<Button-4>", self._on_scroll) # linux scroll up
+        cv.bind("<Button-5>", self._on_scroll) # linux scroll down
 
     def _setup_widgets(self) -> None:
         """Create internal widgets."""
@@ -208,6 +375,19 @@ class CtkLedMatrice(ctk.CTkFrame):
                     (int(self.led_size//2.4), int(self.led_size//2.4))
                 )
 
+    def _set_led(self, led:LED, value:int) -> None:
+        """Set the value of a led, redrawn at the next event loop tick."""
+        led.set(value)
+        if not led.uptodate and self._redraw_id is None:
+            self._redraw_id = self.after_idle(self._redraw)
+
+    def _redraw(self) -> None:
+        """Redraw all the leds changed since the last redraw."""
+        self._redraw_id = None
+        for row in self._matrice:
+            for led in row:
+                led.update()
+
     def _get_select(self, event) -> None:
         """Get the led selected by the mousepointer."""
         led_x, led_y = int(event.x // self.led_size), int(event.y // self.led_size)
@@ -215,42 +395,89 @@ class CtkLedMatrice(ctk.CTkFrame):
             return self._matrice[led_y][led_x]
         return None
 
+    def _get_row(self, led:LED) -> list:
+        """Get the row of leds of a led."""
+        for row in self._matrice:
+            if led in row:
+                return row
+        return []
+
     def _on_click(self, event) -> None:
-        """Click event."""
-        self.dled = None
+        """Click event: toggle the led (painted value for the drag)."""
+        self._create_canvas.focus_set() # for the keys
         led = self._get_select(event)
-        self.after(200, self._click_action, led)
+        if led:
+            self._last_value = led.value
+            self._paint_value = 0 if led.value == self.brightness else self.brightness
+            self._set_led(led, self._paint_value)
+
+    def _on_drag(self, event) -> None:
+        """Drag event: paint the leds under the mouse."""
+        led = self._get_select(event)
+        self.led_select = led
+        if led and self._paint_value is not None:
+            self._set_led(led, self._paint_value)
+
+    def _on_release(self, event) -> None:
+        """Release event: end of the drag."""
+        self._paint_value = None
 
     def _on_dclick(self, event) -> None:
-        """Double Click event."""
-        self.dled = self._get_select(event)
-        self.dclick_flag = True
-
-    def _click_action(self, led:LED) -> None:
-        """Click action."""
-        # code inspired by :
-        # https://stackoverflow.com/questions/27262580/tkinter-binding-mouse-double-click
-        if self.dled != led:
-            self.dclick_flag = False
+        """Double Click event: disable (or enable) the led."""
+        led = self._get_select(event)
         if led:
-            if self.dclick_flag:
-                if led.value == -1: led.set(0)
-                else: 
-                    led.set(-1)
-                led.update()
-                self.dclick_flag = False
-            else:
-                if led.value == 9: led.set(0)
-                else: led.set(9)
-                led.update()
+            # the 1st click toggled the led
+            self._set_led(led, 0 if self._last_value == -1 else -1)
+            self._paint_value = None
+
+    def _on_row_click(self, event, value:int) -> None:
+        """Shift/Control Click event: fill or clear the row of the led."""
+        self._create_canvas.focus_set()
+        led = self._get_select(event)
+        if led:
+            self.set_row(self._matrice.index(self._get_row(led)), value)
+
+    def _on_motion(self, event) -> None:
+        """Motion event: led under the mouse (for the keys)."""
+        self.led_select = self._get_select(event)
+
+    def _on_leave(self, event) -> None:
+        """Leave event: no led under the mouse."""
+        self.led_select = None
+
+    def _on_key(self, event) -> None:
+        """Key event: brightness of the painted leds and the led under the mouse, fill/clear row."""
+        led = self.led_select
+        if event.char.isdigit():
+            self.brightness = max(1, int(event.char))
+            if led:
+                self._set_led(led, int(event.char))
+        elif event.keysym in ["Up", "Down"]:
+            step = 1 if event.keysym == "Up" else -1
+            self.brightness = max(1, min(9, self.brightness + step))
+            if led:
+                self._set_led(led, led.value + step)
+        elif event.char in ["f", "c"] and led:
+            self.set_row(self._matrice.index(self._get_row(led)), self.brightness if event.char == "f" else 0)
 
     def _on_scroll(self, event) -> None:
         """Scroll event."""
         led = self._get_select(event)
         if led:
-            led.set(led.value + 1 if event.delta > 0 else led.value - 1)
-            led.update()
-    
+            up = event.delta > 0 if event.num not in [4, 5] else event.num == 4
+            self._set_led(led, led.value + 1 if up else led.value - 1)
+
+    def set_row(self, y:int, value:int) -> None:
+        """Set all leds of a row."""
+        for led in self._matrice[y]:
+            self._set_led(led, value)
+
+    def set_matrice_values(self, matrice:list[list]) -> None:
+        """Set the leds from a matrice of values (rows of 5 values)."""
+        for x in range(5):
+            for y in range(5):
+                self._set_led(self._matrice[x][y], matrice[x][y])
+
     def get_matrice_values(self) -> list[list]:
         """Get a copy of the matrice, leds remplaced by their values."""
         temp_matrice = [[None for _ in range(5)] for _ in range(5)] #(else, err and modify self._matrice)
@@ -345,84 +572,289 @@ class CtkLedMatrice(ctk.CTkFrame):
 
     def clear_values(self) -> None:
         """Clear the matrice."""
-        for x in range(5):
-            for y in range(5):
-                led = self._matrice[x][y]
-                led.set(0)
-                led.update()
+        self.set_matrice_values([[0] * 5 for _ in range(5)])
+
 
+class CharacterScrollableFrame(ctk.CTkFrame):
 
-class CharacterScrollableFrame(ctk.CTkScrollableFrame):
+    """
+    Virtualised list of frames with miniatures for add a Character in the
+    MicroTamagotchi: only the visible rows have widgets (reused when
+    scrolling), miniatures are cached by frame contents, frames can be
+    moved up/down.
+    """
 
-    """ScrollableFrame with miniatures for add a Character in the MicroTamagotchi."""
-    # code inspired by https://customtkinter.tomschimansky.com/tutorial/scrollable-frames/
+    nb_rows = 4 # visible rows
+    miniature_size = 40
+    _miniatures = {} # cache of the miniatures (CTkImage) by matrice values
 
     def __init__(self, master, width=120) -> None:
-        super().__init__(master, width, label_text="Frames")
+        super().__init__(master, width=width)
         self.del_icon = ctk.CTkImage(Image.open(PATH_ICON_DELETE))
-        self.nb_frames = 0
-        self.miniatures_frames = []
-        self.character_frames = {}
+        self.frames = [] # [matrice, character_frame] of each frame
+        self.first = 0 # index of the first visible frame
+        self.version = 0 # changed with the frames (for the preview)
+        # widgets
+        ctk.CTkLabel(self, text="Frames").grid(row=0, column=0, columnspan=2, pady=(5,0))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, rowspan=self.nb_rows, sticky="ns", padx=(0,5), pady=5)
+        self._rows = [self._create_row(slot) for slot in range(self.nb_rows)]
+        for widget in [self] + [widget for row in self._rows for widget in row]:
+            self._bind_scroll(widget)
+        self._refresh()
+
+    @classmethod
+    def miniature(cls, matrice:list) -> ctk.CTkImage:
+        """Get the miniature of a matrice (cached by values)."""
+        key = tuple(tuple(row) for row in matrice)
+        ctk_miniature = cls._miniatures.get(key)
+        if ctk_miniature is None:
+            if len(cls._miniatures) >= THUMBNAIL_CACHE_SIZE:
+                cls._miniatures.clear()
+            # 1 pixel by led, scaled without smoothing
+            miniature = Image.new('RGB', (5, 5))
+            miniature.putdata([
+                ImageColor.getrgb(LED.color(val)) for row in matrice for val in row
+            ])
+            size = (cls.miniature_size, cls.miniature_size)
+            miniature = miniature.resize(size, Image.NEAREST)
+            ctk_miniature = cls._miniatures[key] = ctk.CTkImage(miniature, size=size)
+        return ctk_miniature
+
+    def _create_row(self, slot:int) -> tuple:
+        """Create the widgets of a visible row (reused for all frames)."""
+        row_frame = ctk.CTkFrame(self)
+        label = ctk.CTkLabel(row_frame, text="", compound="left", width=60)
+        label.grid(row=0, column=0, rowspan=2, padx=(10,5), pady=5)
+        ctk.CTkButton(
+            row_frame, width=20, height=20, text="▲",
+            command=lambda: self.move(self.first + slot, -1)
+        ).grid(row=0, column=1, pady=(5,0))
+        ctk.CTkButton(
+            row_frame, width=20, height=20, text="▼",
+            command=lambda: self.move(self.first + slot, 1)
+        ).grid(row=1, column=1, pady=(0,5))
+        ctk.CTkButton(
+            row_frame, width=30, text="", image=self.del_icon,
+            command=lambda: self.suppr(self.first + slot)
+        ).grid(row=0, column=2, rowspan=2, padx=(5,10), pady=5)
+        return row_frame, label
+
+    def _bind_scroll(self, widget) -> None:
+        """Scroll the list with the mouse wheel over a widget."""
+        widget.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        widget.bind("<Button-4>", lambda event: self.scroll(-1)) # linux
+        widget.bind("<Button-5>", lambda event: self.scroll(1))
+
+    def _on_scrollbar(self, *args) -> None:
+        """Scrollbar command ('moveto', fraction) or ('scroll', nb, 'units')."""
+        if args[0] == "moveto":
+            self.scroll_to(round(float(args[1]) * len(self.frames)))
+        elif args[0] == "scroll":
+            self.scroll(int(args[1]))
+
+    def scroll(self, nb:int) -> None:
+        """Scroll of nb frames."""
+        self.scroll_to(self.first + nb)
+
+    def scroll_to(self, first:int) -> None:
+        """Show the frames from first."""
+        first = max(0, min(first, len(self.frames) - self.nb_rows))
+        if first != self.first:
+            self.first = first
+            self._refresh()
+
+    def _changed(self) -> None:
+        """The frames changed: show them."""
+        self.version += 1
+        self._refresh()
+
+    def _refresh(self) -> None:
+        """Show the visible frames in the rows widgets."""
+        self.first = max(0, min(self.first, len(self.frames) - self.nb_rows))
+        for slot, (row_frame, label) in enumerate(self._rows):
+            indx = self.first + slot
+            if indx < len(self.frames):
+                label.configure(image=self.miniature(self.frames[indx][0]), text=f" {indx + 1}")
+                row_frame.grid(row=slot + 1, column=0, padx=(10,5), pady=5, sticky="w")
+            else:
+                row_frame.grid_remove()
+        if self.frames:
+            self.scrollbar.set(self.first / len(self.frames), min(self.first + self.nb_rows, len(self.frames)) / len(self.frames))
+        else:
+            self.scrollbar.set(0, 1)
 
-    def suppr(self, miniature_frame, id_data:int) -> None:
+    def suppr(self, indx:int) -> None:
         """Delete a frame of the CharacterScrollableFrame and his data."""
-        miniature_frame.destroy()
-        self.character_frames.pop(id_data)
+        if 0 <= indx < len(self.frames):
+            self.frames.pop(indx)
+            self._changed()
+
+    def move(self, indx:int, step:int) -> None:
+        """Move a frame up (step -1) or down (step 1)."""
+        new_indx = indx + step
+        if 0 <= indx < len(self.frames) and 0 <= new_indx < len(self.frames):
+            self.frames[indx], self.frames[new_indx] = self.frames[new_indx], self.frames[indx]
+            # keep the moved frame visible
+            if not self.first <= new_indx < self.first + self.nb_rows:
+                self.first += step
+            self._changed()
 
     def add(self, matrice:list, character_frame:list) -> None:
-        """Add a frame to the CharacterScrollableFrame."""
-        miniature_size = 40
-        # create miniature
-        size = (miniature_size, miniature_size)
-        miniature = Image.new('RGBA', size)
-        draw = ImageDraw.Draw(miniature)
-        led_size = int(miniature_size // 5)
-        for x in range(5):
-            for y in range(5):
-                st, nd = y*led_size, x*led_size
-                draw.rectangle(
-                    [(st,nd), (st+led_size,nd+led_size)], 
-                    fill=LED.color(matrice[x][y])
-                )
-        ctk_miniature = ctk.CTkImage(miniature, size=size)
-        # create miniature_frame
-        miniature_frame = ctk.CTkFrame(self)
-        miniature_frame.grid(row=self.nb_frames, column=0, padx=10, pady=(10, 0), sticky="w")
-        id = self.nb_frames
-        # display miniature and del button widgets
-        ctk.CTkLabel(
-            miniature_frame, 
-            text="",
-            image=ctk_miniature
-        ).grid(row=0, column=0, padx=(10,5), pady=10)
-        ctk.CTkButton(
-            miniature_frame,
-            width=30,
-            text="",
-            image=self.del_icon,
-            command=lambda: self.suppr(miniature_frame, id)
-        ).grid(row=0, column=1, padx=(5,10), pady=10)
-        # append value
-        self.miniatures_frames.append(miniature_frame) # for destroy all
-        self.character_frames[id] = character_frame
-        self.nb_frames += 1
+        """Add a frame to the CharacterScrollableFrame (scrolled to it)."""
+        self.frames.append([matrice, character_frame])
+        self.first = len(self.frames) - self.nb_rows
+        self._changed()
 
     def clear(self) -> None:
         """Clear the CharacterScrollableFrame and all data."""
-        # delete all frames
-        for frame in self.miniatures_frames:
-            frame.destroy()
-        # delete all data
-        self.nb_frames = 0
-        self.miniatures_frames = []
-        self.character_frames = {}
+        self.frames = []
+        self.first = 0
+        self._changed()
 
     def get(self) -> list:
         """Get all data frames of the CharacterScrollableFrame."""
-        data = []
-        for character_frame in self.character_frames.values():
-            data.append(character_frame)
-        return data
+        return [character_frame for _, character_frame in self.frames]
+
+
+def render_frame(img:list, size:list, posx:int, posy:int, rv=False) -> tuple:
+    """
+    Get the 25 values of the microbit screen (by rows) showing a frame at a
+    position, mirrored if rv (like display_img of the MicroTamagotchi).
+    """
+    screen = [0] * 25
+    for x in range(size[0]):
+        for y in range(size[1]):
+            if 0 <= x + posx < 5 and 0 <= y + posy < 5:
+                val = img[(size[0] - 1 - x if rv else x) + y * size[0]]
+                screen[x + posx + (y + posy) * 5] = max(val, 0) # disabled leds are off
+    return tuple(screen)
+
+
+class CtkAnimationPreview(ctk.CTkFrame):
+
+    """
+    Preview of a character animation like on the MicroTamagotchi screen: the
+    screens of a cycle are precomputed (for the frames, delay and motion) and
+    played by a single canvas timer.
+    """
+
+    start_pos = (0, 2) # position of the character at the boot
+    motion_delay = 200 # delay of the steps of the motions
+    motions = { # steps (move x, move y, mirrored) of each motion (like the main loop)
+        "Idle": [],
+        "Jump": [(0, -1, True)] * 5 + [(0, 1, False)] * 5,
+        "Right": [(1, 0, True)] * 5 + [(-1, 0, False)] * 5,
+        "Left": [(-1, 0, False)] * 5 + [(1, 0, True)] * 5,
+    }
+
+    def __init__(self, master, frames:CharacterScrollableFrame, led_size=14, **kwargs) -> None:
+        super().__init__(master, **kwargs)
+        self.frames = frames
+        self.led_size = led_size
+        self._screens = [] # (screen values, delay) of the cycle
+        self._cache_key = None
+        self._indx = 0
+        self._shown = [None] * 25
+        self._timer = None
+        self._setup_widgets()
+
+    def _setup_widgets(self) -> None:
+        """Create internal widgets."""
+        size = self.led_size * 5
+        self.cv = tk.Canvas(self, width=size, height=size, bg="black", highlightthickness=0)
+        self.cv.grid(row=0, column=0, rowspan=3, padx=10, pady=10)
+        self._leds = [
+            self.cv.create_rectangle(
+                x * self.led_size + 1, y * self.led_size + 1,
+                (x + 1) * self.led_size - 1, (y + 1) * self.led_size - 1,
+                outline="", fill=LED.color(0)
+            )
+            for y in range(5) for x in range(5)
+        ]
+        self.tkvar_delay = ctk.StringVar(value="300")
+        delay_frame = ctk.CTkFrame(self, fg_color="transparent")
+        ctk.CTkLabel(delay_frame, text="Delay (ms)").pack(side="left", padx=(0,5))
+        ctk.CTkEntry(delay_frame, width=50, textvariable=self.tkvar_delay).pack(side="left")
+        delay_frame.grid(row=0, column=1, padx=(0,10), pady=(10,0))
+        self.tkvar_mirror = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(self, text="Mirror", variable=self.tkvar_mirror).grid(row=1, column=1, padx=(0,10))
+        self.motion_optm = ctk.CTkOptionMenu(self, width=90, values=list(self.motions))
+        self.motion_optm.grid(row=2, column=1, padx=(0,10), pady=(0,10))
+        self.tkvar_txt_btn_play = ctk.StringVar(value="Play")
+        ctk.CTkButton(
+            self, width=60, textvariable=self.tkvar_txt_btn_play, command=self.toggle
+        ).grid(row=3, column=0, columnspan=2, pady=(0,10))
+
+    def get_delay(self) -> int:
+        """Get the delay of the character (ms, 300 if not valid)."""
+        try:
+            return max(10, int(self.tkvar_delay.get()))
+        except ValueError:
+            return 300
+
+    def _cycle(self, frames:list, delay:int, mirror:bool, motion:str) -> list:
+        """Compute the (screen, delay) of a cycle of the animation."""
+        steps = self.motions[motion] or [(0, 0, mirror)]
+        # the frame change at each step: cycle of the frames and the steps
+        nb = len(frames) * len(steps) // math.gcd(len(frames), len(steps))
+        posx, posy = self.start_pos
+        screens = []
+        for i in range(nb):
+            move_x, move_y, rv = steps[i % len(steps)]
+            posx, posy = posx + move_x, posy + move_y
+            img, size = frames[i % len(frames)]
+            screens.append((render_frame(img, size, posx, posy, rv), delay if motion == "Idle" else self.motion_delay))
+        return screens
+
+    def _update_screens(self) -> None:
+        """Recompute the cycle if the frames or options changed."""
+        key = (self.frames.version, self.get_delay(), self.tkvar_mirror.get(), self.motion_optm.get())
+        if key != self._cache_key:
+            self._cache_key = key
+            frames = self.frames.get()
+            self._screens = self._cycle(frames, *key[1:]) if frames else []
+            self._indx = 0
+
+    def _show(self, screen:tuple) -> None:
+        """Show screen values on the canvas (only the changed leds)."""
+        for i, val in enumerate(screen):
+            if self._shown[i] != val:
+                self._shown[i] = val
+                self.cv.itemconfig(self._leds[i], fill=LED.color(val))
+
+    def _tick(self) -> None:
+        """Show the next screen of the cycle and plan the next tick."""
+        self._update_screens()
+        if not self._screens:
+            self._show((0,) * 25)
+            self._timer = self.after(PREVIEW_IDLE_MS, self._tick)
+            return
+        self._indx %= len(self._screens)
+        screen, delay = self._screens[self._indx]
+        self._show(screen)
+        self._indx += 1
+        self._timer = self.after(delay, self._tick)
+
+    def play(self) -> None:
+        """Play the animation."""
+        if self._timer is None:
+            self.tkvar_txt_btn_play.set("Stop")
+            self._tick()
+
+    def stop(self) -> None:
+        """Stop the animation."""
+        if self._timer is not None:
+            self.after_cancel(self._timer)
+            self._timer = None
+        self.tkvar_txt_btn_play.set("Play")
+
+    def toggle(self) -> None:
+        """Play or stop the animation."""
+        if self._timer is None:
+            self.play()
+        else:
+            self.stop()
 
 
 # App
@@ -435,7 +867,6 @@ class MicroTamagochi_Tool():
     NOTE: This program use a personalized version of pyboard.py tool.
     """
 
-    jsonfile_uuid = "ba1f4ccc-efc6-4766-8111-30408e2feb5d" # created with https://www.uuidgenerator.net/
 
     def __init__(self) -> None:
         # init app
@@ -448,11 +879,19 @@ class MicroTamagochi_Tool():
         self.mt_settings = None
         self.setup_widgets()
 
-        # init connect backend
+        # background jobs (serial operations out of the Tk thread)
+        self.jobs = GuiJobs(self.root, show_job=self.show_job)
+
+        # init connect backend (status sent to the Tk thread, transfer progress received by a thread-safe queue)
+        self.progress_events = queue.Queue()
         self.backend = MicroBit_Backend(
-            show_conn_stat=self.show_connection_status,
-            logfile_path=PATH_LOG
+            show_conn_stat=lambda *stat: self.jobs.call_in_tk(self.show_connection_status, *stat),
+            logfile_path=PATH_LOG,
+            auto_reconnect=True,
+            show_progress=lambda *event: self.progress_events.put(event)
         )
+        self.jobs.log = self.backend.log
+        self.root.after(PROGRESS_UPDATE_MS, self.update_progress)
 
         # create temp dir
         try:
@@ -504,8 +943,24 @@ class MicroTamagochi_Tool():
         self.save_file_btn = ctk.CTkButton(sidebar_frame, text="Save Conf", command=self.cmd_save_conf)
         self.save_file_btn.grid(row=2, column=0, padx=20, pady=(10,5))
 
+        self.merge_libs_btn = ctk.CTkButton(sidebar_frame, text="Merge Libraries", command=self.cmd_merge_libs)
+        self.merge_libs_btn.grid(row=3, column=0, padx=20, pady=(10,5))
+
         self.create_character_frames = CharacterScrollableFrame(sidebar_frame)
-        self.create_character_frames.grid(row=3, column=0, padx=20, pady=20)
+        self.create_character_frames.grid(row=4, column=0, padx=20, pady=20)
+
+        job_frame = ctk.CTkFrame(sidebar_frame, fg_color="transparent")
+        self.tkvar_job = ctk.StringVar()
+        ctk.CTkLabel(job_frame, textvariable=self.tkvar_job, wraplength=150).pack()
+        self.job_pbar = ctk.CTkProgressBar(job_frame, width=150)
+        self.job_pbar.set(0)
+        self.job_pbar.pack(pady=5)
+        self.cancel_job_btn = ctk.CTkButton(
+            job_frame, text="Cancel", width=80, state="disabled",
+            command=self.cmd_cancel_jobs
+        )
+        self.cancel_job_btn.pack()
+        job_frame.grid(row=5, column=0, padx=20, pady=(0,10))
         
         #right tabview
         self.tabv = ctk.CTkTabview(self.root, height=400, width=500)
@@ -546,7 +1001,11 @@ class MicroTamagochi_Tool():
         status_flash_lb.grid(row=0, column=1, padx=10, pady=10)
         
         self.flash_status_pbar = ctk.CTkProgressBar(frame_down, width=300, indeterminate_speed=.4)
-        self.flash_status_pbar.grid(row=1, column=0, columnspan=2, pady=15)
+        self.flash_status_pbar.grid(row=1, column=0, columnspan=2, pady=(15,5))
+
+        self.tkvar_progress = ctk.StringVar()
+        progress_lb = ctk.CTkLabel(frame_down, textvariable=self.tkvar_progress)
+        progress_lb.grid(row=2, column=0, columnspan=2, pady=(0,10))
         frame_down.pack()
 
         #create
@@ -570,7 +1029,7 @@ class MicroTamagochi_Tool():
         )
         clear_character_btn.pack(pady=(10,5))
 
-        ctk.CTkLabel(frame_right, text="Character Name").pack(pady=(40,0))
+        ctk.CTkLabel(frame_right, text="Character Name").pack(pady=(20,0))
         self.character_name_entry = ctk.CTkEntry(frame_right)
         self.character_name_entry.pack(pady=5)
         
@@ -579,6 +1038,9 @@ class MicroTamagochi_Tool():
             command=self.cmd_add_character
         )
         self.add_character_btn.pack(pady=(10,5))
+
+        self.create_preview = CtkAnimationPreview(frame_right, self.create_character_frames)
+        self.create_preview.pack(pady=(10,5))
         frame_right.grid(row=0, column=1)
         
         #settings/infos
@@ -622,7 +1084,7 @@ class MicroTamagochi_Tool():
             pbar_c.configure(mode="determinate")
             pbar_c.set(1)
             if self.need_load_mt_settings:
-                Thread(target=self.load_mt_settings).start()
+                self.load_mt_settings()
                 self.need_load_mt_settings = False
             self.add_character_btn.configure(state="normal")
             self.import_file_btn.configure(state="normal")
@@ -655,19 +1117,10 @@ class MicroTamagochi_Tool():
         elif flashing: # and connected
             flash_txt_btn, flash_status = "Stop", "Flashing ..."
             conn_btn_state = flash_btn_state= "disabled"
+            # indeterminate until the transfer progress is received
             pbar_f.configure(mode="indeterminnate")
             pbar_f.set(0)
             pbar_f.start()
-#            f_ty, wri, tot = flash_hex_info
-#            if f_ty is None:
-#                pbar_f.configure(mode="indeterminnate")
-#                pbar_f.set(0)
-#                pbar_f.start()
-#            elif f_ty == "hex":
-#                pbar_f.configure(mode="indeterminnate")
-#                pbar_f.set((tot - wri) // tot)
-#            elif f_ty == "files":
-#                pass
         else:
             flash_txt_btn = "Flash Project"
             if flash_failed: flash_status = "Flash Failed"
@@ -684,6 +1137,40 @@ class MicroTamagochi_Tool():
         self.tkvar_txt_btn_flash.set(flash_txt_btn)
         self.tkvar_flash_status.set("Status : "+flash_status)
 
+    def show_job(self, job:GuiJob, done:int, total:int, text:str) -> None:
+        """Show the progress of the background job (None: no job running)."""
+        if job is None:
+            self.tkvar_job.set(text.capitalize())
+            self.job_pbar.set(0)
+            self.cancel_job_btn.configure(state="disabled")
+            return
+        txt = job.name
+        if text:
+            txt += f" : {text}"
+        if total:
+            txt += f" ({done}/{total})"
+        self.tkvar_job.set(txt)
+        self.job_pbar.set(done / total if total else 0)
+        self.cancel_job_btn.configure(state="normal")
+
+    def update_progress(self) -> None:
+        """Show the last transfer progress received from the backend (throttled)."""
+        event = None
+        while True:
+            try:
+                event = self.progress_events.get_nowait()
+            except queue.Empty:
+                break
+        if event is not None:
+            _, _, done, total, _, _ = event
+            self.tkvar_progress.set(format_progress(*event))
+            if self.backend.flashing and total:
+                pbar_f = self.flash_status_pbar
+                pbar_f.stop()
+                pbar_f.configure(mode="determinate")
+                pbar_f.set(done / total)
+        self.root.after(PROGRESS_UPDATE_MS, self.update_progress)
+
     def set_tab_settings(self) -> None:
         """Set the widgets in the settings tab."""
         # set characters list and selected
@@ -746,105 +1233,81 @@ class MicroTamagochi_Tool():
         if save and self.settingsfile_found: 
             self.save_settings()
 
-    def read_mt_file(self, file, remove=True) -> dict:
-        """Get a mt file and read his content."""
-        # create tempfile
-        tempfile = temp_path(file)
-        # get file
-        self.backend.send_cmd("get", (file, tempfile)) # get the file at the path tempfile
-        with open(tempfile, "r") as rf:
-            # load data
-            data = eval(rf.read())
-        # remove tempfile
-        if remove:
-            os.remove(tempfile)
-        # return data
-        return data
-
-    def write_mt_file(self, file, data, remove=True) -> None:
-        """Write data in a file and put this."""
-        # create tempfile
-        tempfile = temp_path(file)
-        # write data in a tempfile
-        with open(tempfile, "w") as rw:
-            rw.write(repr(data))
-        # send tempfile
-        self.backend.send_cmd(f"put", (tempfile,)) # put the modified tempfile (with data)
-        # remove temp file
-        if remove:
-            os.remove(tempfile)
-
-    def load_mt_settings(self, wait=0.5) -> None:
-        """Load settings from the MicroTamagotchi."""
-        # setting file
-        settfile = 'settings.mtd'
-        # sleep a little (wait connected cmd executed)
-        st = time.time()
-        while time.time() - st < wait: time.sleep(0.05)
-        # get data in a tempfile
+    def read_mt_file(self, file) -> dict:
+        """Get a mt file (through the backend cache of board files) and read his content."""
+        try:
+            content = self.backend.send_cmd("read", (file,))
+        except PyboardError as err: # like a missing file
+            raise OSError(f"cannot read '{file}' on the microbit ({err})") from err
+        if content is None:
+            raise OSError(f"cannot read '{file}' on the microbit")
+        # load data (parsed, not evaluated)
+        return data_lib.loads(content.decode("utf-8"))
+
+    def commit_mt_files(self, changes:dict) -> None:
+        """Write (or remove if None) MicroTamagotchi files in one transaction (blocking)."""
+        if not self.backend.send_cmd("commit", (changes,)):
+            raise OSError("cannot write the files on the microbit")
+
+    def write_mt_file(self, file, data) -> None:
+        """Write data in a mt file in one transaction (and in the backend cache of board files)."""
+        if not self.backend.send_cmd("commit", ({file: repr(data)},)):
+            raise OSError(f"cannot write '{file}' on the microbit")
+
+    def read_character(self, name:str) -> dict:
+        """Get a character of the MicroTamagotchi (his file, else in the old file of all characters)."""
         try:
-            # get mt settings data
-            self.mt_settings = self.read_mt_file(settfile)
-            # actualize save var
+            character = self.read_mt_file(character_file(name))
+        except OSError:
+            character = self.read_mt_file("images.mtd")[name]
+        return library.expand_character(character)
+
+    def load_mt_settings(self) -> None:
+        """Load settings from the MicroTamagotchi (in a background job)."""
+        def job_load(job):
+            # the read is queued after the connect cmd (executed in order by the backend)
+            return self.read_mt_file('settings.mtd')
+        def loaded(mt_settings):
+            self.mt_settings = mt_settings
             self.need_save = True
-        except:
+            self.set_tab_settings()
+        def failed(err):
             self.mt_settings = None
-        # actualize settings tab widgets
-        self.set_tab_settings()
-
-    def save_mt_settings(self) -> bool:
-        """Save settings in MicroTamagotchi."""
-        # setting file
-        settfile = 'settings.mtd'
-        # try to get settings
-        if self.mt_settings is not None:
-            try:
-                # save mt settings
-                self.write_mt_file(settfile, self.mt_settings)
-            except:
-                return False
-            else:
-                return True
+            self.set_tab_settings()
+        self.jobs.submit("Load settings", job_load, on_done=loaded, on_error=failed)
 
     # --- Other ---
 
-    def add_character_to_mt(self, name:str, new_character:list) -> None:
-        """Insert a character in microTamagotchi."""
+    def add_character_to_mt(self, settings:dict, name:str, new_character:list, delay=300) -> dict:
+        """Insert a character in microTamagotchi (blocking), return the new settings."""
         # create data
-        fig_data = {
-            "delay": 300, #TODO: add delay btn
+        fig_data = library.compact_character({
+            "delay": delay,
             "data": new_character
-        }
-        imgfile = 'images.mtd'
-
-        #add new character
-        try:
-            # read and modify data
-            data_imgs = self.read_mt_file(imgfile)
-            data_imgs[name] = fig_data # erase character with same name
-            # write data
-            self.write_mt_file(imgfile, data_imgs)
-
-            # save new character name in settings
-            if name not in self.mt_settings["characters_list"]:
-                self.mt_settings["characters_list"].append(name) # check character name
-            self.save_mt_settings()
-            self.need_save = True
-        except:
-            return False
-        else:
-            return True
+        }, rle=COMPACT_RLE, delta=COMPACT_DELTA)
+
+        # new character name in settings
+        settings = dict(settings)
+        if name not in settings["characters_list"]:
+            settings["characters_list"] = settings["characters_list"] + [name]
+        # write only the character file (erase character with same name) and settings
+        if not self.backend.send_cmd("upsert", (name, fig_data, settings)):
+            raise OSError(f"cannot write the character '{name}' on the microbit")
+        return settings
     
     def save_configurations(self) -> bool:
-        """Save MicroTamagotchi configuration in a .json file."""
+        """
+        Save MicroTamagotchi configuration in a .json file, return True if the
+        app can exit now (else it exit when the configuration is saved).
+        """
         action = CTkMessagebox(
             title="Save Data & Exit ?", icon="question", 
             message="Do you want to save actual MicroTamagotchi configurations in a file ?",
             option_1="Cancel", option_2="No", option_3="Yes"
         ).get()
         if action == "Yes":
-            self.cmd_save_conf()
-            return True
+            self.cmd_save_conf(on_saved=self._exit)
+            return False
         elif action == "No":
             return True
         else:
@@ -856,28 +1319,40 @@ class MicroTamagochi_Tool():
     def cmd_optm_character_selected(self, character:list) -> None:
         """Set the selected character in MicroTamagotchi Settings."""
         # change setting
-        self.mt_settings["character"] = character
+        settings = dict(self.mt_settings, character=character)
 
-        # save settingg
-        if self.save_mt_settings():
+        # save settings (in a background job)
+        def saved(_):
+            self.mt_settings = settings
             self.create_leds.clear_values()
             CTkMessagebox(
                 title="Info", icon="info",
                 message=f"Character '{character}' is selected on the MicroTamagotchi !"
             )
             self.need_save = True
-        else:
+        def failed(err):
+            self.set_tab_settings()
             CTkMessagebox(
                 title="Warning !", icon="warning",
                 message=f"Selection of Character '{character}' on the MicroTamagotchi failed !" 
             )
+        self.jobs.submit(
+            f"Select '{character}'", lambda job: self.write_mt_file("settings.mtd", settings),
+            on_done=saved, on_error=failed
+        )
+
+    def cmd_cancel_jobs(self) -> None:
+        """Cancel the background jobs."""
+        self.jobs.cancel_all()
 
     def cmd_connect_stop_or_disconnect(self) -> None:
         """Connect or disconnect the microbit"""
         if self.backend.connected:
-            self.backend.send_cmd("restart")
+            self.jobs.submit("Disconnect", lambda job: self.backend.send_cmd("restart"))
+        elif self.backend.connecting:
+            self.backend.stop_connect()
         else:
-            self.backend.connecting = not self.backend.connecting
+            self.backend.send_cmd("connect", wait=False)
         self.backend.show_conn_stat()
 
     def cmd_flash_initial_firmware(self) -> None:
@@ -888,7 +1363,7 @@ class MicroTamagochi_Tool():
                     "Do you want to flash the project in micro:bit ?",
             option_1="Cancel", option_2="No", option_3="Yes"
         ).get() == "Yes":
-            self.backend.flashing = True
+            self.backend.send_cmd("flash", wait=False)
         self.backend.show_conn_stat()
 
     def cmd_add_frame_to_character(self) -> None:
@@ -921,22 +1396,29 @@ class MicroTamagochi_Tool():
                 message="Name your character !"
             )
             return
-        # add character
-        if self.add_character_to_mt(name, new_character):
+        # add character (in a background job)
+        settings, delay = self.mt_settings, self.create_preview.get_delay()
+        def added(settings):
+            self.mt_settings = settings
+            self.need_save = True
             # clear data on widgets
             self.character_name_entry.delete(0, "end")
             self.create_character_frames.clear()
-            self.load_mt_settings(wait=0)
+            self.load_mt_settings()
             # show msg ok
             CTkMessagebox(
                 title="Info", icon="info",
                 message=f"Character '{name}' saved in the MicroTamagotchi !"
             )
-        else:
+        def failed(err):
             CTkMessagebox(
                 title="Warning !", icon="warning",
                 message=f"Save of character '{name}' in the MicroTamagotchi failed !"
             )
+        self.jobs.submit(
+            f"Add '{name}'", lambda job: self.add_character_to_mt(settings, name, new_character, delay),
+            on_done=added, on_error=failed
+        )
 
     def cmd_optm_restart_after(self, value:str) -> None:
         """Set the parameter 'restart_after_flash' for the backend."""
@@ -948,76 +1430,194 @@ class MicroTamagochi_Tool():
         self.backend.restart_after_flash = restart
     
     def cmd_import_conf(self) -> None:
-        """Import configurations from a .json file."""
+        """Import a characters library (or an old configuration file) in the MicroTamagotchi."""
         # search file
         file = filedialog.askopenfilename(
             title="Import MicroTamagotchi Configurations",
-            filetypes=[('data', '*.json')]
+            filetypes=LIBRARY_FILETYPES
         )
-
-        if file is not None:
-            # read conf file    
-            with open(file, "r") as r_conf:
-                data_conf = json.load(r_conf)
-            # check uuid
-            if self.jsonfile_uuid == data_conf['uuid']:
-                # extract data
-                self.mt_settings = data_conf["settings"]
-                images = data_conf["images"]
-                # unformat data (from more readable data in json file)
-                for chr in images:
-                    for indx, data in enumerate(images[chr]["data"]):
-                        images[chr]["data"][indx] = eval(data)
-                # send conf data
-                self.save_mt_settings()
-                self.set_tab_settings()
-                self.write_mt_file('images.mtd', images)
-                # show ok
-                CTkMessagebox(
-                    title="Info", icon="info",
-                    message=f"Configurations imported from a file !"
-                )
-
+        if not file:
+            return
+        # merge with the characters of the microtamagotchi or replace them
+        action = CTkMessagebox(
+            title="Import", icon="question",
+            message="Do you want to merge the library with the characters of the MicroTamagotchi or replace them ?",
+            option_1="Cancel", option_2="Replace", option_3="Merge"
+        ).get()
+        if action not in ("Replace", "Merge"):
+            return
+        mt_settings = self.mt_settings
+        merge = action == "Merge" and mt_settings is not None
+        policy = "replace"
+        if merge:
+            policy = CTkMessagebox(
+                title="Merge", icon="question",
+                message="For the characters with the same name, keep the first, replace by the last or rename them ?",
+                option_1="Keep", option_2="Replace", option_3="Rename"
+            ).get()
+            if policy is None:
+                return
+            policy = policy.lower()
+
+        # import in a background job (a character in memory, uploaded by batches)
+        def job_import(job):
+            # first pass: check the whole library before upload anything
+            with library.LibraryReader(file) as reader:
+                names, imported = [], set()
+                for name, _ in reader:
+                    job.progress(reader.position, reader.size * 2, name)
+                    if name in imported:
+                        raise library.LibraryError(f"{file}: character '{name}' is twice in the library")
+                    names.append(name)
+                    imported.add(name)
+                lib_settings = reader.settings
+            # name of each character (the same policy as the merge of libraries)
+            if merge:
+                board_names = mt_settings["characters_list"]
+                plan = library.plan_names([(0, name) for name in board_names] + [(1, name) for name in names], policy)
+                settings = dict(mt_settings, characters_list=[name for name in plan if name is not None])
+                plan = plan[len(board_names):]
             else:
-                CTkMessagebox(
-                    title="Warning !", icon="warning",
-                    message="Configuration file is not valid, can't import this !"
-                )
+                plan = names
+                settings = dict(lib_settings, characters_list=names)
+            if settings.get("character") not in settings["characters_list"] and settings["characters_list"]:
+                settings["character"] = settings["characters_list"][0]
+
+            # second pass: upload the characters by batches under staged names, moved by the
+            # last transaction with the settings (the microtamagotchi is unchanged until it)
+            moves, changes, batch_size = {}, {}, 0
+            try:
+                with library.LibraryReader(file) as reader:
+                    for (name, character), dest in zip(reader, plan):
+                        job.progress(reader.size + reader.position, reader.size * 2, name)
+                        if dest is None:
+                            continue # kept character of the microtamagotchi
+                        staged = data_lib.STAGED_PREFIX + character_file(dest)
+                        changes[staged] = repr(library.compact_character(
+                            character, rle=COMPACT_RLE, delta=COMPACT_DELTA
+                        ))
+                        moves[character_file(dest)] = (staged,)
+                        batch_size += len(changes[staged])
+                        if batch_size >= IMPORT_BATCH_BYTES:
+                            self.commit_mt_files(changes)
+                            changes, batch_size = {}, 0
+                    job.check()
+                changes.update(moves)
+                # remove the old characters
+                if not merge and mt_settings is not None:
+                    for name in mt_settings["characters_list"]:
+                        if name not in imported:
+                            changes[character_file(name)] = None
+                changes["settings.mtd"] = repr(settings)
+                self.commit_mt_files(changes)
+            except BaseException:
+                # import failed or cancelled: remove the staged characters
+                if moves:
+                    try:
+                        self.commit_mt_files({staged: None for staged, in moves.values()})
+                    except Exception as err:
+                        self.backend.log.warning(f"staged characters not removed ({type(err).__name__}: {err})")
+                raise
+            return settings
+        def imported(settings):
+            self.mt_settings = settings
+            self.need_save = True
+            self.set_tab_settings()
+            # show ok
+            CTkMessagebox(
+                title="Info", icon="info",
+                message=f"{len(settings['characters_list'])} characters in the MicroTamagotchi after the import !"
+            )
+        def failed(err):
+            if isinstance(err, ValueError):
+                message = f"Library file is not valid, can't import this !\n{err}"
+            else:
+                message = "Import of the library in the MicroTamagotchi failed !"
+            CTkMessagebox(title="Warning !", icon="warning", message=message)
+        self.jobs.submit("Import", job_import, on_done=imported, on_error=failed)
 
-    def cmd_save_conf(self) -> None:
-        """Save configurations in a .json file."""
-        file_conf = filedialog.asksaveasfile(
+    def cmd_save_conf(self, on_saved=None) -> None:
+        """Save the characters of the MicroTamagotchi in a library file (call on_saved when saved)."""
+        path = filedialog.asksaveasfilename(
             title="Save MicroTamagotchi Configurations",
-            initialfile="microtamagotchi_conf.json",
-            filetypes=[('data', '*.json')], 
-            defaultextension=".json"
+            initialfile="microtamagotchi_library" + library.LIBRARY_EXT,
+            filetypes=LIBRARY_FILETYPES[:1], 
+            defaultextension=library.LIBRARY_EXT
         )
-        if file_conf is not None:
-            # get images
-            images = self.read_mt_file("images.mtd")
-            # format a little the data for more visibility when read json conf file
-            for chr in images:
-                for indx, data in enumerate(images[chr]["data"]):
-                    images[chr]["data"][indx] = repr(data)
-            # create conf
-            data_conf = {
-                "uuid": self.jsonfile_uuid, # unique id for recognize microtamagotchi_confs
-                "settings": self.mt_settings, # settings are already loaded
-                "images": images # actual images of the microtamagotchi
-            }
-            # save conf
-            json.dump(data_conf, file_conf, indent=4)
+        if not path:
+            return
+        settings = self.mt_settings # settings are already loaded
+
+        # save in a background job (a character read and written at a time)
+        def job_save(job):
+            characters = settings["characters_list"]
+            with library.LibraryWriter(path, settings) as writer:
+                for nb, chr in enumerate(characters):
+                    job.progress(nb, len(characters), chr)
+                    writer.write(chr, self.read_character(chr))
+                job.check()
+        def saved(_):
             self.need_save = False
-            # close file
-            file_conf.close()
+            if on_saved is not None:
+                on_saved()
+        def failed(err):
+            CTkMessagebox(
+                title="Warning !", icon="warning",
+                message="Save of the configurations in a file failed !"
+            )
+        self.jobs.submit("Save", job_save, on_done=saved, on_error=failed)
+
+    def cmd_merge_libs(self) -> None:
+        """Merge characters libraries in a new library file."""
+        paths = filedialog.askopenfilenames(
+            title="Libraries to merge",
+            filetypes=LIBRARY_FILETYPES
+        )
+        if not paths:
+            return
+        policy = CTkMessagebox(
+            title="Merge", icon="question",
+            message="For the characters with the same name, keep the first, replace by the last or rename them ?",
+            option_1="Keep", option_2="Replace", option_3="Rename"
+        ).get()
+        if policy is None:
+            return
+        dest = filedialog.asksaveasfilename(
+            title="Save the merged library",
+            initialfile="microtamagotchi_library" + library.LIBRARY_EXT,
+            filetypes=LIBRARY_FILETYPES[:1],
+            defaultextension=library.LIBRARY_EXT
+        )
+        if not dest:
+            return
+
+        # merge in a background job (a character in memory)
+        def merged(settings):
+            CTkMessagebox(
+                title="Info", icon="info",
+                message=f"{len(settings['characters_list'])} characters in the merged library !"
+            )
+        def failed(err):
+            CTkMessagebox(
+                title="Warning !", icon="warning",
+                message=f"Merge of the libraries failed !\n{err}"
+            )
+        self.jobs.submit(
+            "Merge", lambda job: library.merge_libraries(list(paths), dest, policy.lower(), job.progress),
+            on_done=merged, on_error=failed
+        )
 
     # --- Exit ---
 
     def _exit(self, wait=True) -> None:
         """Quit application and close the serial."""
-        # quit backend
+        # cancel the background jobs and quit backend
+        self.jobs.cancel_all()
         if wait: 
-            self.backend.send_cmd("restart")
+            try:
+                self.backend.send_cmd("restart")
+            except Exception:
+                pass # already logged by the backend, quit anyway
         self.backend.exit(wait)
         # destroy app
         self.root.destroy()
@@ -1029,7 +1629,7 @@ class MicroTamagochi_Tool():
         # save configurations in a file if needed
         if self.need_save and self.backend.connected:
             if self.save_configurations():
-                # exit app if "Cancel" button not clicked
+                # exit app if "No" button clicked (exit after the save if "Yes")
                 self._exit()
         elif self.backend.flashing:
             if CTkMessagebox(
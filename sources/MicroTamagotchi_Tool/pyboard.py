@@ -46,11 +46,13 @@ Example usage:
 # a lot of useful commands, like exec, copy or stat
 
 import ast
+import binascii
 import errno
 import os
 import struct
 import sys
 import time
+import zlib
 
 try:
     stdout = sys.stdout.buffer
@@ -180,11 +182,11 @@ class Pyboard:
             # Waiting for "soft reboot" independently to "raw REPL" (done below)
             # allows boot.py to print, which will show up after "soft reboot"
             # and before "raw REPL".
-            data = self.read_until(1, b"soft reboot\r\n")
+            data = self.read_until(1, b"soft reboot\r\n", timeout=timeout)
             if not data.endswith(b"soft reboot\r\n"):
                 raise PyboardError("could not enter raw repl")
 
-        data = self.read_until(1, b"raw REPL; CTRL-B to exit\r\n", timeout=3)
+        data = self.read_until(1, b"raw REPL; CTRL-B to exit\r\n", timeout=min(timeout, 3))
         if not data.endswith(b"raw REPL; CTRL-B to exit\r\n"):
             print(data)
             #raise PyboardError("could not enter raw repl")
@@ -404,32 +406,127 @@ class Pyboard:
                 progress_callback(written, src_size)
         self.exec("fr.close()\nfw.close()")
 
-    def fs_get(self, src, dest=None, chunk_size=256, progress_callback=None):
-        """Get a file from the board."""
-        if progress_callback:
-            src_size = self.fs_stat(src).st_size
-            written = 0
+    def fs_get(self, src, dest=None, chunk_size=1024, progress_callback=None):
+        """
+        Get a file from the board in one exec: the board streams base64 (or hex
+        if ubinascii is missing) blocks, then the size counted while streaming
+        and an adler32 checksum. The size announced first (os.size on the
+        micro:bit, which has no os.stat) is only for the progress.
+        """
         if dest is None:
             dest = os.path.basename(src)
-        self.exec("f=open('%s','rb')\nr=f.read" % src)
+        cmd = (
+            "import os\n"
+            "try:z=os.size('%s')\n"
+            "except AttributeError:z=os.stat('%s')[6]\n"
+            "try:\n"
+            " from ubinascii import b2a_base64\n"
+            " e=lambda b:str(b2a_base64(b),'ascii').strip()\n"
+            " print('b64',z)\n"
+            "except ImportError:\n"
+            " e=lambda b:''.join('%%02x'%%x for x in b)\n"
+            " print('hex',z)\n"
+            "a=1\nc=0\nn=0\n"
+            "with open('%s','rb') as f:\n"
+            " while 1:\n"
+            "  b=f.read(%u)\n"
+            "  if not b:break\n"
+            "  n+=len(b)\n"
+            "  for x in b:a=(a+x)%%65521;c=(c+a)%%65521\n"
+            "  print(e(b))\n"
+            "print('#',n,c<<16|a)" % (src, src, src, chunk_size)
+        )
+        header, data, checksum = None, bytearray(), None
+        self.exec_raw_no_follow(cmd)
+        lines = self.read_lines()
+        try:
+            for line in lines:
+                if header is None:
+                    encoding, src_size = line.split()
+                    header = (encoding, int(src_size))
+                elif line.startswith("#"):
+                    size, checksum = (int(value) for value in line[1:].split())
+                else:
+                    if header[0] == "b64":
+                        data.extend(binascii.a2b_base64(line))
+                    else:
+                        data.extend(bytes.fromhex(line))
+                    if progress_callback:
+                        progress_callback(len(data), header[1])
+        except ValueError as e:
+            # read the rest of the output up to the end of the exec (not read by the next exec)
+            try:
+                for _ in lines:
+                    pass
+            except PyboardError:
+                pass
+            raise PyboardError("fs_get: Could not interpret received data: %s" % str(e))
+        except PyboardError as e:
+            raise e.convert(src)
+        if header is None or checksum is None:
+            raise PyboardError("fs_get: incomplete transfer of %s" % src)
+        if len(data) != size or zlib.adler32(data) != checksum:
+            raise PyboardError("fs_get: corrupted transfer of %s (checksum)" % src)
         with open(dest, "wb") as f:
-            while True:
-                data = bytearray()
-                self.exec("print(r(%u))" % chunk_size, data_consumer=lambda d: data.extend(d))
-                assert data.endswith(b"\r\n\x04")
-                try:
-                    data = ast.literal_eval(str(data[:-3], "ascii"))
-                    if not isinstance(data, bytes):
-                        raise ValueError("Not bytes")
-                except (UnicodeError, ValueError) as e:
-                    raise PyboardError("fs_get: Could not interpret received data: %s" % str(e))
-                if not data:
-                    break
-                f.write(data)
-                if progress_callback:
-                    written += len(data)
-                    progress_callback(written, src_size)
-        self.exec("f.close()")
+            f.write(data)
+
+    def fs_checksum(self, src, chunk_size=1024):
+        """Get (size, adler32 checksum) of a board file in one exec."""
+        cmd = (
+            "a=1\nc=0\nn=0\n"
+            "with open('%s','rb') as f:\n"
+            " while 1:\n"
+            "  b=f.read(%u)\n"
+            "  if not b:break\n"
+            "  n+=len(b)\n"
+            "  for x in b:a=(a+x)%%65521;c=(c+a)%%65521\n"
+            "print(n,c<<16|a)" % (src, chunk_size)
+        )
+        try:
+            size, checksum = self.exec(cmd).split()
+        except PyboardError as e:
+            raise e.convert(src)
+        return int(size), int(checksum)
+
+    def read_lines(self, timeout=10):
+        """
+        Yield the lines of the normal output of an exec (read by large buffers),
+        raise PyboardError with the error output if any.
+        """
+        buf = bytearray()
+        outputs = [] # normal and error outputs, ended by \x04
+        timeout_count = 0
+        while len(outputs) < 2:
+            n = self.serial.inWaiting()
+            if n == 0:
+                timeout_count += 1
+                if timeout is not None and timeout_count >= 100 * timeout:
+                    raise PyboardError("timeout waiting for EOF reception")
+                time.sleep(0.01)
+                continue
+            timeout_count = 0
+            buf.extend(self.serial.read(n))
+            while len(outputs) < 2:
+                if not outputs:
+                    # normal output: yield complete lines
+                    end = buf.find(b"\x04")
+                    lines_end = buf.rfind(b"\n", 0, end if end >= 0 else len(buf)) + 1
+                    for line in bytes(buf[:lines_end]).decode("ascii", "replace").splitlines():
+                        if line:
+                            yield line
+                    del buf[:lines_end]
+                    if end < 0:
+                        break
+                    outputs.append(bytes(buf[:end - lines_end]))
+                    del buf[:end - lines_end + 1]
+                else:
+                    end = buf.find(b"\x04")
+                    if end < 0:
+                        break
+                    outputs.append(bytes(buf[:end]))
+                    del buf[:end + 1]
+        if outputs[1]:
+            raise PyboardError("exception", outputs[0], outputs[1])
 
     def fs_put(self, src, chunk_size=256, progress_callback=None):
         """Put a computer file in the board."""
@@ -0,0 +1,109 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - TOOL STATS ---
+
+# imports
+import os
+import json
+import time
+from threading import Lock
+from contextlib import contextmanager
+
+
+# performance stats
+class PerfStats:
+
+    """
+    Performance stats of the backend: timing spans (count, total, min, max in
+    seconds) and counters (bytes moved, retries...), thread-safe. Each finished
+    span can be appended as a JSON line in a file (for compare runs).
+    """
+
+    def __init__(self, jsonl_path=None, info=None):
+        self.jsonl_path = jsonl_path
+        self.info = dict(info or {}) # labels of the run (host, versions...)
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear all spans and counters."""
+        with self._lock:
+            self.spans = {} # name: [count, total, min, max]
+            self.counters = {} # name: value
+
+    @contextmanager
+    def span(self, name):
+        """Measure the duration of a block (also if he raise)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def add_span(self, name, duration):
+        """Add a span already measured (in seconds)."""
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [1, duration, duration, duration]
+            else:
+                span[0] += 1
+                span[1] += duration
+                span[2] = min(span[2], duration)
+                span[3] = max(span[3], duration)
+            if self.jsonl_path is not None:
+                self._write_line({"time": time.time(), "span": name, "duration": duration})
+
+    def count(self, name, value=1):
+        """Add a value to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self) -> dict:
+        """Get a copy of the info, spans and counters."""
+        with self._lock:
+            return {
+                "info": dict(self.info),
+                "spans": {
+                    name: {"count": count, "total": total, "min": min_d, "max": max_d}
+                    for name, (count, total, min_d, max_d) in self.spans.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_json(self) -> str:
+        """Export the stats as a JSON line."""
+        return json.dumps(dict(self.snapshot(), time=time.time()))
+
+    def to_prometheus(self, prefix="microtamagotchi") -> str:
+        """Export the stats as a Prometheus text dump."""
+        snapshot = self.snapshot()
+        labels = ",".join(f'{key}="{value}"' for key, value in sorted(snapshot["info"].items()))
+        lines = [
+            f"# TYPE {prefix}_info gauge",
+            f"{prefix}_info{{{labels}}} 1",
+            f"# TYPE {prefix}_span_seconds summary",
+        ]
+        for name, span in sorted(snapshot["spans"].items()):
+            lines.append(f'{prefix}_span_seconds_count{{span="{name}"}} {span["count"]}')
+            lines.append(f'{prefix}_span_seconds_sum{{span="{name}"}} {span["total"]:.6f}')
+        lines.append(f"# TYPE {prefix}_span_seconds_max gauge")
+        for name, span in sorted(snapshot["spans"].items()):
+            lines.append(f'{prefix}_span_seconds_max{{span="{name}"}} {span["max"]:.6f}')
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def _write_line(self, line:dict):
+        """Append a JSON line in the stats file (the lock is already acquired)."""
+        try:
+            os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+            with open(self.jsonl_path, "a") as f_stats:
+                f_stats.write(json.dumps(dict(line, **self.info)) + "\n")
+        except OSError:
+            self.jsonl_path = None # not retry at each span
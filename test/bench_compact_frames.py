@@ -0,0 +1,58 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - BENCHMARK COMPACT CHARACTERS ---
+
+# imports
+import os
+import sys
+import time
+import tracemalloc
+
+# library of the tool (compact) and data_lib of the microbit sources (decode)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "MicroTamagotchi_Tool"))
+import library
+data_lib = library.data_lib
+
+# constants
+NB_FRAMES = 60 # frames of the animation (played 2 times in the character)
+COMPACT_OPTIONS = [("digits", False, False), ("rle", True, False), ("delta", False, True), ("rle + delta", True, True)]
+
+
+def make_character(nb_frames) -> dict:
+    """Create a character with an animation of small changes (like a walk), played 2 times."""
+    frames, pixels = [], [0] * 25
+    for f in range(nb_frames):
+        pixels = list(pixels)
+        pixels[f % 25] = (f // 25 + 5) % 10
+        frames.append([pixels, [5, 5]])
+    return {"delay": 100, "data": frames + frames}
+
+def measure(text, compact) -> tuple:
+    """Load a character file and play all his frames, return (RAM after the load in bytes, ms by frame)."""
+    tracemalloc.start()
+    character = data_lib.loads(text)
+    frames = data_lib.Frames(character) if compact else character["data"]
+    frames[0]
+    ram = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for indx in range(len(frames)):
+        frames[indx]
+    return ram, (time.perf_counter() - start) * 1000 / len(frames)
+
+
+# compare the old format and the compact formats
+character = make_character(NB_FRAMES)
+text = repr(character)
+ram, ms = measure(text, False)
+print("%d frames" % len(character["data"]))
+print("%-12s %6d bytes in file %6d bytes in RAM %.4f ms by frame" % ("list", len(text), ram, ms))
+for name, rle, delta in COMPACT_OPTIONS:
+    compact_text = repr(library.compact_character(character, rle=rle, delta=delta))
+    assert library.expand_character(data_lib.loads(compact_text)) == character
+    ram, ms = measure(compact_text, True)
+    print("%-12s %6d bytes in file %6d bytes in RAM %.4f ms by frame" % (name, len(compact_text), ram, ms))
@@ -0,0 +1,94 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Micropython (on microbit v2) / Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - BENCHMARK MTD PARSER ---
+
+# imports
+import gc
+import sys
+import time
+
+# find data_lib in the microbit sources (on computer)
+if sys.platform != "microbit":
+    import os
+    import tracemalloc
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "MicroTamagotchi"))
+import data_lib
+
+# constants
+BENCH_FILE = "bench.mtd"
+if sys.platform == "microbit":
+    NB_CHARACTERS, NB_FRAMES, REPEAT = 4, 6, 3 # small filesystem and RAM
+else:
+    NB_CHARACTERS, NB_FRAMES, REPEAT = 200, 12, 5
+
+def ticks_us():
+    """Get a time in microseconds."""
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+def make_library(nb_characters, nb_frames) -> dict:
+    """Create a characters library like images.mtd."""
+    library = {}
+    for i in range(nb_characters):
+        library["character_%d" % i] = {
+            "delay": 100 + i,
+            "data": [[[(x + y + f) % 10 for x in range(25)], [5, 5]] for f in range(nb_frames) for y in range(1)]
+        }
+    return library
+
+def measure(funct):
+    """Call a function, return (result, duration in ms, peak memory in bytes)."""
+    gc.collect()
+    if sys.platform == "microbit":
+        # allocated memory (gc not called during a short run)
+        mem_before = gc.mem_alloc()
+        start = ticks_us()
+        result = funct()
+        duration = time.ticks_diff(ticks_us(), start)
+        peak = gc.mem_alloc() - mem_before
+    else:
+        tracemalloc.start()
+        start = ticks_us()
+        result = funct()
+        duration = ticks_us() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, duration / 1000, peak
+
+def load_eval():
+    with open(BENCH_FILE, 'r') as f_read:
+        return eval(f_read.read())
+
+def load_parser():
+    return data_lib.load(BENCH_FILE)
+
+
+# write the library
+library = make_library(NB_CHARACTERS, NB_FRAMES)
+with open(BENCH_FILE, 'w') as f_write:
+    f_write.write(repr(library))
+del library
+gc.collect()
+
+# compare eval and the parser
+print("file: %s (%d characters, %d frames)" % (BENCH_FILE, NB_CHARACTERS, NB_FRAMES))
+results = {}
+for name, funct in [("eval", load_eval), ("parser", load_parser)]:
+    durations, peaks = [], []
+    for _ in range(REPEAT):
+        result, duration, peak = measure(funct)
+        durations.append(duration)
+        peaks.append(peak)
+    results[name] = result
+    print("%s: %.1f ms (best of %d), peak memory %d bytes" % (name, min(durations), REPEAT, max(peaks)))
+print("same data:", results["eval"] == results["parser"])
+
+# remove the library
+if sys.platform == "microbit":
+    import os
+os.remove(BENCH_FILE)
@@ -0,0 +1,66 @@
+#Projet: MicroTamagotchi
+#Auteurs: Killian Nallet, Mattéo Martin-Boileux
+#Python: Python >= 3.9
+#Coding: utf-8
+
+
+#--- MICROTAMAGOTCHI - BENCHMARK LIB_NEOPIX (SIMULATOR) ---
+
+# imports
+import os
+import sys
+import time
+
+# simulator without window, lib_neopix from the microbit sources
+os.environ["MICROTK_HEADLESS"] = "1"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sources", "MicroTamagotchi"))
+import lib_neopix
+
+# constants
+NB_LEDS = 30
+DURATION = 2 # seconds by mode
+MODES = [ # (name, mode, data, new data by loop pass or None)
+    ("all", "all", (255, 0, 0), None),
+    ("pulse", "pulse", ((255, 0, 0), 3), None),
+    ("count (no change)", "count", (15, (0, 0, 255), (0, 255, 0)), None),
+    ("count (change each pass)", "count", (15, (0, 0, 255), (0, 255, 0)), lambda i: (i % 31, (0, 0, 255), (0, 255, 0))),
+]
+
+
+def bench_mode(mode, data, new_data):
+    """Run the loop of game.server for a mode, return its stats."""
+    lib_neopix.set_neopix(mode, data, True)
+    lib_neopix.neopix_stats()
+    strip = lib_neopix.np
+    show_count, show_time = strip.show_count, strip.show_time
+    nb_pass, actualize_time = 0, 0
+    end = time.perf_counter() + DURATION
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        lib_neopix.actualize_neopix(new_data(nb_pass) if new_data else None)
+        actualize_time += time.perf_counter() - start
+        nb_pass += 1
+    stats = lib_neopix.neopix_stats()
+    show_count, show_time = strip.show_count - show_count, strip.show_time - show_time
+    return {
+        "passes_s": nb_pass / DURATION,
+        "us_by_pass": (actualize_time - show_time) / nb_pass * 1000000,
+        "shows_s": show_count / DURATION,
+        "show_ms_s": show_time * 1000 / DURATION,
+        "skipped": stats["skipped"],
+        "limited": stats["limited"],
+    }
+
+
+# bench each mode
+lib_neopix.init_neopix(NB_LEDS, None)
+print(f"{NB_LEDS} leds, {DURATION} s by mode, fps max {lib_neopix.FPS_MAX}, write time {lib_neopix.np.write_time() * 1000:.2f} ms")
+for name, mode, data, new_data in MODES:
+    stats = bench_mode(mode, data, new_data)
+    print(
+        f"{name:<26} {stats['passes_s']:>9.0f} passes/s {stats['us_by_pass']:>6.1f} us/pass (without show)"
+        f" {stats['shows_s']:>5.1f} shows/s {stats['show_ms_s']:>5.1f} ms/s in show"
+        f" (skipped {stats['skipped']}, limited {stats['limited']})"
+    )
+lib_neopix.off_neopix()
+print(f"frames logged: {len(lib_neopix.np.frames_log)}")